@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio ingestion pipeline, for hand histories coming from many sources at once (python 3.6+).
+
+reader -> parse (PS2acpc) -> rewrite (acpc2PS, optional) -> writer
+
+The parse and rewrite stages run in an executor (a process pool for real loads), each stage takes its input
+from a bounded queue, so a slow stage makes the readers wait instead of buffering everything.
+
+async def main():
+    async with Pipeline(sink=print, executor=ProcessPoolExecutor(4), rewrite=True) as pipeline:
+        server = await serve(pipeline, port=9999)  # one source per connection
+        await watch_directory(pipeline, 'drop/')  # or one source per dropped file
+"""
+
+import os
+import sys
+import codecs
+import fnmatch
+import asyncio
+import itertools
+import traceback
+from collections import namedtuple
+
+from HH_tools import HandSplitter, iter_hands, PS2acpc, acpc2PS
+
+# source: name of the source, index: number of the hand in the source, hand: PokerStars text,
+# acpc: PS2acpc tuple, ps_text: acpc2PS text (None without rewrite), error: formatted exception or None
+Converted = namedtuple('Converted', ['source', 'index', 'hand', 'acpc', 'ps_text', 'error'])
+
+
+def _parse(hand):
+    try:
+        return PS2acpc(hand), None
+    except Exception:
+        return None, traceback.format_exc().strip()
+
+
+def _rewrite(acpc):
+    ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+    try:
+        return acpc2PS(stacks, sequence, holecards, boardcards, winner, players, ante, bblind,
+                       uncalled=uncalled), None
+    except Exception:
+        return None, traceback.format_exc().strip()
+
+
+class Pipeline:
+    """
+    Bounded stages between the sources and the sink. Use it as an async context manager, or call start() and join().
+    Hands of one source are written in the order they complete, not always the order they were read,
+    Converted.index gives the original order.
+    """
+
+    def __init__(self, sink, executor=None, workers=4, queue_size=256, rewrite=False, on_error=None):
+        """
+        :param sink: function or coroutine function called with each Converted, in the event loop
+        :param executor: concurrent.futures executor for PS2acpc and acpc2PS, None for the loop default
+        :param workers: number of hands in flight in each executor stage
+        :param queue_size: max number of hands waiting in front of each stage
+        :param rewrite: also write the hands back with acpc2PS
+        :param on_error: called with (converted, exception) when the sink raises on a hand, the writer then goes on
+        with the next hand. The source, index and traceback are printed on stderr when None
+        """
+        self.sink = sink
+        self.executor = executor
+        self.workers = workers
+        self.rewrite = rewrite
+        self.on_error = on_error
+        self.sink_errors = 0  # hands the sink raised on
+        self._parse_queue = asyncio.Queue(queue_size)
+        self._rewrite_queue = asyncio.Queue(queue_size)
+        self._write_queue = asyncio.Queue(queue_size)
+        self._tasks = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.join()
+        else:
+            self.cancel()
+
+    def start(self):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.ensure_future(self._parse_worker()))
+            if self.rewrite:
+                self._tasks.append(asyncio.ensure_future(self._rewrite_worker()))
+        self._tasks.append(asyncio.ensure_future(self._writer()))
+
+    async def join(self):
+        """
+        Wait until every hand put so far is written, then stop the stages
+        """
+        await self._parse_queue.join()
+        await self._rewrite_queue.join()
+        await self._write_queue.join()
+        self.cancel()
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def put(self, source, index, hand):
+        """
+        Queue one hand, waits while the parse stage is full
+        """
+        await self._parse_queue.put((source, index, hand))
+
+    async def feed(self, source, hands):
+        """
+        Queue all the hands of a source, hands is an iterable or an async iterable of hand texts
+        :return: number of hands queued
+        """
+        index = 0
+        if hasattr(hands, '__aiter__'):
+            async for hand in hands:
+                await self.put(source, index, hand)
+                index += 1
+        else:
+            for hand in hands:
+                await self.put(source, index, hand)
+                index += 1
+        return index
+
+    ##########
+    # Stages #
+    ##########
+
+    async def _parse_worker(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            source, index, hand = await self._parse_queue.get()
+            try:
+                acpc, error = await loop.run_in_executor(self.executor, _parse, hand)
+                converted = Converted(source, index, hand, acpc, None, error)
+                if self.rewrite and error is None:
+                    await self._rewrite_queue.put(converted)
+                else:
+                    await self._write_queue.put(converted)
+            finally:
+                self._parse_queue.task_done()
+
+    async def _rewrite_worker(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            converted = await self._rewrite_queue.get()
+            try:
+                ps_text, error = await loop.run_in_executor(self.executor, _rewrite, converted.acpc)
+                await self._write_queue.put(converted._replace(ps_text=ps_text, error=error))
+            finally:
+                self._rewrite_queue.task_done()
+
+    async def _writer(self):
+        while True:
+            converted = await self._write_queue.get()
+            try:
+                result = self.sink(converted)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:  # a dead writer would leave feed() and join() waiting on full queues
+                self._sink_error(converted, e)
+            finally:
+                self._write_queue.task_done()
+
+    def _sink_error(self, converted, exception):
+        self.sink_errors += 1
+        if self.on_error is not None:
+            self.on_error(converted, exception)
+        else:
+            print('sink error on hand {} of {}:\n{}'.format(converted.index, converted.source,
+                                                            traceback.format_exc().strip()), file=sys.stderr)
+
+
+###########
+# Sources #
+###########
+
+async def stream_hands(reader, chunk_size=1 << 16, encoding='utf-8'):
+    """
+    Async generator over the hands read from an asyncio StreamReader
+    """
+    decoder = codecs.getincrementaldecoder(encoding)('replace')
+    splitter = HandSplitter()
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        for hand in splitter.feed(decoder.decode(data)):
+            yield hand
+    for hand in splitter.feed(decoder.decode(b'', final=True)) + splitter.flush():
+        yield hand
+
+
+async def serve(pipeline, host='127.0.0.1', port=0):
+    """
+    Start a TCP server feeding the pipeline, each connection is a source sending raw history text
+    :return: the asyncio server, its sockets give the port when port=0
+    """
+    async def handle(reader, writer):
+        peer = writer.get_extra_info('peername')
+        source = '{}:{}'.format(peer[0], peer[1]) if peer else 'socket'
+        try:
+            await pipeline.feed(source, stream_hands(reader))
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def _take(iterator, n):
+    return list(itertools.islice(iterator, n))
+
+
+async def file_hands(file_path, batch_size=256):
+    """
+    Async generator over the hands of a file, read batch_size hands at a time in the default executor
+    so the event loop does not wait on the disk
+    """
+    loop = asyncio.get_event_loop()
+    hands = iter_hands(file_path)
+    while True:
+        batch = await loop.run_in_executor(None, _take, hands, batch_size)
+        if not batch:
+            return
+        for hand in batch:
+            yield hand
+
+
+async def watch_directory(pipeline, path, pattern='*.txt', interval=1.0, once=False):
+    """
+    File drop source: feed every new file matching pattern in path, each file is a source.
+    Files must be complete when they appear (written elsewhere, then moved in the directory).
+    Only the files still in the directory are remembered: a file removed then dropped again is fed again.
+    """
+    loop = asyncio.get_event_loop()
+    seen = set()
+    while True:
+        filenames = await loop.run_in_executor(None, os.listdir, path)
+        file_paths = [os.path.join(path, filename) for filename in sorted(fnmatch.filter(filenames, pattern))]
+        seen.intersection_update(file_paths)  # bounded by the directory, not by everything ever dropped
+        for file_path in file_paths:
+            if file_path not in seen:
+                seen.add(file_path)
+                await pipeline.feed(file_path, file_hands(file_path))
+        if once:
+            return
+        await asyncio.sleep(interval)
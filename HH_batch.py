@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Batch conversion of whole history files or directories with PS2acpc, spread over a process pool.
+
+for result in convert_files(['histories/'], workers=4):
+    if result.error is None:
+        ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = result.acpc
+"""
+
+import os
+import fnmatch
+import threading
+import traceback
+import multiprocessing
+from collections import namedtuple
+
+from HH_tools import iter_hands, PS2acpc
+
+# acpc is the PS2acpc tuple, None when the hand failed. error is the formatted exception, or None
+ConvertedHand = namedtuple('ConvertedHand', ['path', 'index', 'acpc', 'error'])
+
+
+def list_files(paths, pattern='*.txt'):
+    """
+    Expand the directories of paths into the sorted list of the files matching pattern, files are kept as given
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, filenames in os.walk(path):
+                dirs.sort()
+                for filename in sorted(fnmatch.filter(filenames, pattern)):
+                    files.append(os.path.join(root, filename))
+        else:
+            files.append(path)
+    return files
+
+
+def iter_jobs(files):
+    """
+    Yield (path, index, hand) for every hand of files, the jobs of convert_files and HH_validate
+    """
+    for path in files:
+        for index, hand in enumerate(iter_hands(path)):
+            yield path, index, hand
+
+
+def _convert_hand(job):
+    """
+    Worker function, never raises so one bad hand does not stop the batch
+    """
+    path, index, hand = job
+    try:
+        return ConvertedHand(path, index, PS2acpc(hand), None)
+    except Exception:
+        return ConvertedHand(path, index, None, traceback.format_exc().strip())
+
+
+def imap_bounded(pool, func, jobs, chunksize, max_pending):
+    """
+    pool.imap(func, jobs, chunksize), reading at most max_pending jobs ahead of the results taken by the caller.
+    pool.imap alone reads the whole jobs iterable as fast as it can, this keeps the workers busy without
+    holding the archive in memory.
+
+    :param max_pending: jobs read and not yet returned, at least chunksize
+    :return: yields the results in jobs order
+    """
+    slots = threading.Semaphore(max(max_pending, chunksize))
+    stopped = []
+
+    def throttled():
+        for job in jobs:
+            slots.acquire()  # blocks the task thread of the pool, not the caller
+            if stopped:
+                return
+            yield job
+
+    try:
+        for result in pool.imap(func, throttled(), chunksize):
+            slots.release()
+            yield result
+    finally:
+        stopped.append(True)
+        slots.release()  # wakes the task thread if it waits, so the pool can be terminated
+
+
+def convert_files(paths, workers=None, chunksize=64, pattern='*.txt'):
+    """
+    Convert every hand of the given files and directories with PS2acpc.
+
+    Hands are sent to the pool by chunks of chunksize, and only a few chunks per worker are read ahead
+    (imap_bounded), so memory does not grow with the size of the archive.
+
+    :param paths: list of history files or directories (walked recursively for pattern)
+    :param workers: number of processes, defaults to the number of cpus. 1 converts in the current process
+    :param chunksize: number of hands sent to a worker at once
+    :param pattern: file name pattern used in directories
+    :return: yields a ConvertedHand per hand, in file then hand order
+    """
+    files = list_files(paths, pattern)
+    jobs = iter_jobs(files)
+
+    if workers == 1:
+        for job in jobs:
+            yield _convert_hand(job)
+        return
+
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in imap_bounded(pool, _convert_hand, jobs, chunksize, workers * chunksize * 4):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the parser and the writer on synthetic PokerStars hands.
+
+python HH_bench.py -n 5000 --seed 1 --label v0.3 -o bench_v0.3.json
+python HH_bench.py -n 5000 --seed 1 --compare bench_v0.3.json
+python HH_bench.py --parsers hands_example.txt --passes 200
+
+The report gives, for PS2acpc, acpc2PS and the round trip (PS2acpc -> acpc2PS -> PS2acpc),
+the number of hands and errors, hands per second, p50/p99 latency in microseconds and memory (peak of the stage
+on python 3, peak rss of the whole process on python 2).
+With --parsers, the legacy HandHistory, FastHandHistory and PS2acpc are timed on the hands of a history file instead.
+"""
+
+from __future__ import print_function
+
+import gc
+import sys
+import json
+import random
+import argparse
+import platform
+import timeit
+
+try:
+    import tracemalloc  # python 3
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+from HH_tools import HandHistory, FastHandHistory, PS2acpc, acpc2PS, iter_hands, profiling
+from HH_codec import CARDS
+
+_pos_name_lst = HandHistory.pos_name_lst
+
+_street_names = ['HOLE CARDS', 'FLOP', 'TURN', 'RIVER']
+_summary_folds = ['folded before Flop', 'folded on the Flop', 'folded on the Turn', 'folded on the River']
+
+
+#############
+# Generator #
+#############
+
+def generate_hand(rng, hand_id, n_players=3, depth=0, n_raises=1, showdown=False, bblind=20):
+    """
+    Write a synthetic tournament hand in the PokerStars format.
+
+    :param rng: random.Random instance
+    :param hand_id: number of the hand
+    :param n_players: 2 to 10 players, positions are taken from HandHistory.pos_name_lst
+    :param depth: last street reached, 0 preflop to 3 river
+    :param n_raises: number of bets/raises on each street
+    :param showdown: whether the players left go to showdown, if not everybody folds to the last raiser
+    :param bblind: big blind in chips
+    :return: text of the hand
+    """
+    positions = _pos_name_lst[n_players - 2]
+    seats = list(range(1, n_players + 1))
+    btn_index = rng.randrange(n_players)
+    # seat order starting from the button, gives the position of each seat
+    seat_pos = {}
+    for i, pos in enumerate(positions):
+        seat_pos[seats[(btn_index + i) % n_players]] = pos
+    pos_seat = dict((pos, seat) for seat, pos in seat_pos.items())
+    names = dict((pos, 'Player{}'.format(pos_seat[pos])) for pos in positions)
+    stacks = dict((pos, rng.randrange(50, 250) * bblind // 2) for pos in positions)
+
+    deck = list(CARDS)
+    rng.shuffle(deck)
+    holecards = dict((pos, deck.pop() + ' ' + deck.pop()) for pos in positions)
+    board = [deck.pop() for _ in range(5)]
+
+    lines = ["PokerStars Hand #{}: Tournament #1000, $10+$1 USD Hold'em No Limit - Level I ({}/{}) - "
+             "2015/08/18 7:59:19 ET".format(hand_id, bblind // 2, bblind),
+             "Table '1000 1' {}-max Seat #{} is the button".format(n_players, pos_seat['BTN'])]
+    for seat in seats:
+        pos = seat_pos[seat]
+        lines.append("Seat {}: {} ({} in chips) ".format(seat, names[pos], stacks[pos]))
+
+    # heads up, the button posts the small blind
+    sb_pos = 'SB' if 'SB' in positions else 'BTN'
+    invested = dict((pos, 0) for pos in positions)  # total of the hand
+    street_inv = dict((pos, 0) for pos in positions)
+    street_inv[sb_pos] = invested[sb_pos] = min(bblind // 2, stacks[sb_pos])
+    street_inv['BB'] = invested['BB'] = min(bblind, stacks['BB'])
+    lines.append("{}: posts small blind {}".format(names[sb_pos], street_inv[sb_pos]))
+    lines.append("{}: posts big blind {}".format(names['BB'], street_inv['BB']))
+
+    if n_players == 2:
+        preflop_order = ['BTN', 'BB']
+        postflop_order = ['BB', 'BTN']
+    else:
+        preflop_order = positions[3:] + positions[:3]
+        postflop_order = positions[1:] + positions[:1]
+
+    in_hand = list(positions)
+    folded_on = {}
+    last_street = depth
+
+    for street in range(depth + 1):
+        if street > 0 and sum(1 for pos in in_hand if invested[pos] < stacks[pos]) < 2:
+            last_street = street - 1  # all-in, no more betting
+            break
+        if street == 0:
+            lines.append("*** HOLE CARDS ***")
+            lines.append("Dealt to {} [{}]".format(names[positions[0]], holecards[positions[0]]))
+            order = [pos for pos in preflop_order if pos in in_hand]
+            current = bblind
+        else:
+            street_cards = board[:3 + street - 1]
+            cards_str = ' '.join(street_cards[:3])
+            if street == 1:
+                lines.append("*** FLOP *** [{}]".format(cards_str))
+            else:
+                lines.append("*** {} *** [{}] [{}]".format(_street_names[street], ' '.join(street_cards[:-1]),
+                                                          street_cards[-1]))
+            order = [pos for pos in postflop_order if pos in in_hand]
+            street_inv = dict((pos, 0) for pos in positions)
+            current = 0
+
+        ends_here = street == depth and not showdown
+        raises_left = n_raises
+        to_act = list(order)
+        while to_act and len(in_hand) > 1:
+            pos = to_act.pop(0)
+            if pos not in in_hand:
+                continue
+            left = stacks[pos] - invested[pos]
+            if left == 0:
+                continue
+            to_call = current - street_inv[pos]
+            if raises_left > 0 and left > to_call:
+                raise_to = min(max(current * 3, bblind), street_inv[pos] + left)
+                allin = " and is all-in" if raise_to == street_inv[pos] + left else ""
+                if current == 0:
+                    lines.append("{}: bets {}{}".format(names[pos], raise_to, allin))
+                else:
+                    lines.append("{}: raises {} to {}{}".format(names[pos], raise_to - current, raise_to, allin))
+                invested[pos] += raise_to - street_inv[pos]
+                street_inv[pos] = raise_to
+                current = raise_to
+                raises_left -= 1
+                # everybody else acts again
+                to_act = [p for p in order[order.index(pos) + 1:] + order[:order.index(pos)] if p in in_hand]
+            elif to_call > 0 and (ends_here or (street == 0 and len(in_hand) > 2 and rng.random() < 0.3)):
+                lines.append("{}: folds ".format(names[pos]))
+                in_hand.remove(pos)
+                folded_on[pos] = street
+            elif to_call > 0:
+                call = min(to_call, left)
+                allin = " and is all-in" if call == left else ""
+                lines.append("{}: calls {}{}".format(names[pos], call, allin))
+                invested[pos] += call
+                street_inv[pos] += call
+            else:
+                lines.append("{}: checks ".format(names[pos]))
+        if len(in_hand) == 1:
+            last_street = street
+            break
+
+    pot = sum(invested.values())
+    if len(in_hand) == 1:
+        winner = in_hand[0]
+        others = max(invested[pos] for pos in positions if pos != winner)
+        uncalled = invested[winner] - others
+        if uncalled > 0:
+            lines.append("Uncalled bet ({}) returned to {}".format(uncalled, names[winner]))
+            pot -= uncalled
+        lines.append("{} collected {} from pot".format(names[winner], pot))
+        lines.append("{}: doesn't show hand ".format(names[winner]))
+        shown = []
+    else:
+        # run the remaining board, the winner is drawn at random, this is only for the parser
+        for street in range(last_street + 1, 4):
+            street_cards = board[:3 + street - 1]
+            if street == 1:
+                lines.append("*** FLOP *** [{}]".format(' '.join(street_cards)))
+            else:
+                lines.append("*** {} *** [{}] [{}]".format(_street_names[street], ' '.join(street_cards[:-1]),
+                                                          street_cards[-1]))
+        last_street = 3
+        lines.append("*** SHOW DOWN ***")
+        shown = list(in_hand)
+        winner = rng.choice(shown)
+        for pos in shown:
+            lines.append("{}: shows [{}] (high card)".format(names[pos], holecards[pos]))
+        lines.append("{} collected {} from pot".format(names[winner], pot))
+
+    lines.append("*** SUMMARY ***")
+    lines.append("Total pot {} | Rake 0 ".format(pot))
+    n_board = [0, 3, 4, 5][last_street]
+    if n_board:
+        lines.append("Board [{}]".format(' '.join(board[:n_board])))
+    pos_labels = {'BTN': ' (button)', 'SB': ' (small blind)', 'BB': ' (big blind)'}
+    for seat in seats:
+        pos = seat_pos[seat]
+        label = pos_labels.get(pos, '')
+        if pos in folded_on:
+            result = _summary_folds[folded_on[pos]]
+        elif pos == winner and pos in shown:
+            result = "showed [{}] and won ({}) with high card".format(holecards[pos], pot)
+        elif pos == winner:
+            result = "collected ({})".format(pot)
+        elif pos in shown:
+            result = "showed [{}] and lost with high card".format(holecards[pos])
+        else:
+            result = "folded before Flop"
+        lines.append("Seat {}: {}{} {}".format(seat, names[pos], label, result))
+    return '\n'.join(lines)
+
+
+def generate_hands(n_hands, seed=0, players=(2, 10), max_depth=3, max_raises=3, showdown_rate=0.3):
+    """
+    Generate n_hands synthetic hands, varying the number of players, street depth, raises and showdowns
+    """
+    rng = random.Random(seed)
+    hands = []
+    for hand_id in range(1, n_hands + 1):
+        hands.append(generate_hand(rng, hand_id,
+                                   n_players=rng.randint(players[0], players[1]),
+                                   depth=rng.randint(0, max_depth),
+                                   n_raises=rng.randint(0, max_raises),
+                                   showdown=rng.random() < showdown_rate))
+    return hands
+
+
+##########
+# Timing #
+##########
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[int(round(p * (len(sorted_values) - 1)))]
+
+
+def _peak_memory(func, items):
+    """
+    Memory used while running func over items, in kB.
+    On python 3, peak_memory_kb is the peak of the allocations traced during the stage. Without tracemalloc,
+    process_peak_rss_kb is the max rss of the whole process so far: it only grows from a stage to the next
+    and is not the peak of the stage.
+    :return: dict with one of the keys above, empty when neither is available
+    """
+    if tracemalloc is not None:
+        tracemalloc.start()
+        for item in items:
+            try:
+                func(item)
+            except Exception:
+                pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {'peak_memory_kb': peak // 1024}
+    if resource is not None:
+        return {'process_peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {}
+
+
+def time_stage(func, items):
+    """
+    Run func on every item, return the stats of the stage
+    """
+    timer = timeit.default_timer
+    latencies = []
+    errors = 0
+    gc.collect()
+    start = timer()
+    for item in items:
+        t0 = timer()
+        try:
+            func(item)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(timer() - t0)
+    elapsed = timer() - start
+
+    latencies.sort()
+    stats = {
+        'hands': len(items),
+        'errors': errors,
+        'seconds': elapsed,
+        'hands_per_sec': len(latencies) / elapsed if elapsed else None,
+        'p50_us': _percentile(latencies, 0.5) * 1e6 if latencies else None,
+        'p99_us': _percentile(latencies, 0.99) * 1e6 if latencies else None,
+    }
+    stats.update(_peak_memory(func, items))
+    return stats
+
+
+def _acpc2ps(acpc):
+    ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+    return acpc2PS(stacks, sequence, holecards, boardcards, winner, players, ante, bblind, uncalled=uncalled)
+
+
+def _round_trip(hand):
+    return PS2acpc(_acpc2ps(PS2acpc(hand)))
+
+
+def run_benchmark(n_hands=2000, seed=0, label=None, profile=False, **generator_args):
+    """
+    Generate the hands and time each stage, return the report as a dict.
+    With profile, the round trip is run once more with the stage profiler, its report is added under 'profile'.
+    """
+    hands = generate_hands(n_hands, seed=seed, **generator_args)
+
+    acpc_hands = []
+    for hand in hands:
+        try:
+            acpc_hands.append(PS2acpc(hand))
+        except Exception:
+            pass
+
+    report = {
+        'label': label,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'seed': seed,
+        'generator': dict(generator_args, n_hands=n_hands),
+        'stages': {
+            'PS2acpc': time_stage(PS2acpc, hands),
+            'acpc2PS': time_stage(_acpc2ps, acpc_hands),
+            'round_trip': time_stage(_round_trip, hands),
+        },
+    }
+
+    if profile:
+        with profiling() as profiler:
+            for hand in hands:
+                try:
+                    _round_trip(hand)
+                except Exception:
+                    pass
+        report['profile'] = profiler.report()
+    return report
+
+
+def compare(report, reference):
+    """
+    Return the lines comparing hands per second and latencies of report against reference
+    """
+    lines = []
+    for stage, stats in sorted(report['stages'].items()):
+        ref = reference['stages'].get(stage)
+        if ref is None or not ref.get('hands_per_sec') or not stats.get('hands_per_sec'):
+            continue
+        lines.append("{:<12} {:>10.0f} hands/s ({:+.1%})  p50 {:.0f}us ({:+.1%})  p99 {:.0f}us ({:+.1%})".format(
+            stage, stats['hands_per_sec'], stats['hands_per_sec'] / ref['hands_per_sec'] - 1,
+            stats['p50_us'], stats['p50_us'] / ref['p50_us'] - 1,
+            stats['p99_us'], stats['p99_us'] / ref['p99_us'] - 1))
+    return lines
+
+
+def _best_time(parser, hands, passes, repeat):
+    timer = timeit.default_timer
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = timer()
+        for _ in range(passes):
+            for hand in hands:
+                parser(hand)
+        elapsed = timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare_parsers(hands, passes=200, repeat=3):
+    """
+    Time the parsers on passes over the hands, best of repeat runs
+    :return: dict parser: seconds, and the speedups of FastHandHistory and PS2acpc over HandHistory
+    """
+    report = {'hands': len(hands), 'passes': passes, 'python': platform.python_version()}
+    for name, parser in [('HandHistory', HandHistory), ('FastHandHistory', FastHandHistory), ('PS2acpc', PS2acpc)]:
+        report[name] = _best_time(parser, hands, passes, repeat)
+    report['FastHandHistory_speedup'] = report['HandHistory'] / report['FastHandHistory']
+    report['PS2acpc_speedup'] = report['HandHistory'] / report['PS2acpc']
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--hands', type=int, default=2000, help="number of synthetic hands")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', help="version label stored in the report")
+    parser.add_argument('-o', '--output', help="write the JSON report to this file")
+    parser.add_argument('--compare', help="JSON report of a previous run to compare with")
+    parser.add_argument('--profile', action='store_true', help="add the time spent in each parser/writer stage")
+    parser.add_argument('--parsers', metavar='HISTORY_FILE',
+                        help="compare the parsers on the hands of this file instead (they must all parse)")
+    parser.add_argument('--passes', type=int, default=200, help="passes over the file with --parsers")
+    args = parser.parse_args(argv)
+
+    if args.parsers:
+        report = compare_parsers(list(iter_hands(args.parsers)), args.passes)
+        report['label'] = args.label
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return
+    report = run_benchmark(args.hands, seed=args.seed, label=args.label, profile=args.profile)
+    report_json = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(report_json)
+    else:
+        print(report_json)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            reference = json.load(fh)
+        for line in compare(report, reference):
+            print(line, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary file of ACPC hands, read back through a mmap.
+
+with open('hands.acpcb', 'wb') as fh:
+    writer = BinaryWriter(fh)
+    for hand in iter_hands('archive.txt'):
+        writer.write(ParsedHand.from_text(hand))
+
+with BinaryReader('hands.acpcb') as reader:
+    for hand in reader:  # ParsedHand
+        print(hand.to_acpc())
+
+File: b'ACPB' and a version byte, then the records. Each record is its length (uint32) followed by
+    n_players                       1 byte
+    ante, bblind, uncalled          varints, cents
+    stacks                          n_players varints, cents, by position index
+    holecards                       2 * n_players signed bytes, -1 when not shown
+    n_board, boardcards             1 byte, n_board bytes
+    winner                          1 byte, position index, 255 when the winner is not a player name,
+                                    then followed by the name
+    players                         n_players names, by position index
+    n_actions, actions              varint, then 1 byte per action, the HH_codec action type (0: f, 1: c, 2: /,
+                                    3: r followed by a varint raise to amount in cents)
+names are a varint length and the utf-8 bytes. Positions are indexes in the HandHistory.pos_name_lst sublist
+of the hand, cards are the ints of HH_codec.
+"""
+
+import os
+import mmap
+import struct
+from array import array
+
+try:
+    from sys import intern  # python 3, intern is a builtin in python 2
+except ImportError:
+    pass
+
+from HH_codec import RAISE, ACTION_CHARS, cents2str, parse_sequence
+from HH_record import ParsedHand
+
+MAGIC = b'ACPB'
+VERSION = 1
+
+_NO_WINNER_INDEX = 255
+_LENGTH = struct.Struct('<I')
+_FILE_HEADER = MAGIC + bytes(bytearray([VERSION]))
+
+if bytes is str:  # python 2
+    def _name_from_bytes(data):
+        return intern(str(data))
+else:
+    def _name_from_bytes(data):
+        return intern(data.decode('utf-8'))
+
+
+############
+# Encoding #
+############
+
+def _put_varint(buf, value):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _put_name(buf, name):
+    data = name if isinstance(name, bytes) else name.encode('utf-8')
+    _put_varint(buf, len(data))
+    buf.extend(data)
+
+
+def _put_sequence(buf, sequence):
+    actions = parse_sequence(sequence)
+    _put_varint(buf, len(actions))
+    for action_type, cents in actions:
+        buf.append(action_type)
+        if action_type == RAISE:
+            _put_varint(buf, cents)
+
+
+def encode_hand(hand):
+    """
+    Return the record of a ParsedHand, without its length
+    """
+    n_players = len(hand.players)
+    buf = bytearray([n_players])
+    _put_varint(buf, hand.ante)
+    _put_varint(buf, hand.bblind)
+    _put_varint(buf, hand.uncalled)
+    for stack in hand.stacks:
+        _put_varint(buf, stack)
+    buf.extend(hand.holecards.tostring() if bytes is str else hand.holecards.tobytes())
+    buf.append(len(hand.boardcards))
+    buf.extend(hand.boardcards.tostring() if bytes is str else hand.boardcards.tobytes())
+
+    if hand.winner in hand.players:
+        buf.append(hand.players.index(hand.winner))
+    else:
+        buf.append(_NO_WINNER_INDEX)
+        _put_name(buf, hand.winner)
+    for name in hand.players:
+        _put_name(buf, name)
+
+    _put_sequence(buf, hand.sequence)
+    return buf
+
+
+class BinaryWriter:
+    """
+    Write records to a binary file object, the file header is written with the first record
+    (or at once when the file is empty, see write_header)
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self._header_written = fileobj.tell() > 0  # appending to an existing file
+
+    def write_header(self):
+        self.fileobj.write(_FILE_HEADER)
+        self._header_written = True
+
+    def write(self, hand):
+        """
+        :param hand: ParsedHand
+        """
+        if not self._header_written:
+            self.write_header()
+        record = encode_hand(hand)
+        self.fileobj.write(_LENGTH.pack(len(record)) + bytes(record))
+
+    def write_all(self, hands):
+        n_written = 0
+        for hand in hands:
+            self.write(hand)
+            n_written += 1
+        return n_written
+
+
+############
+# Decoding #
+############
+
+def _get_varint(record, pos):
+    """
+    :param record: bytearray
+    :return: (value, position after the varint)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = record[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _get_name(record, pos):
+    length, pos = _get_varint(record, pos)
+    return _name_from_bytes(record[pos:pos + length]), pos + length
+
+
+def decode_hand(record):
+    """
+    Decode one record (bytearray, or any buffer of bytes)
+    :return: ParsedHand
+    """
+    if not isinstance(record, bytearray):
+        record = bytearray(record)  # indexing gives ints on python 2 and 3
+
+    n_players = record[0]
+    pos = 1
+    amounts = []  # ante, bblind, uncalled and the stacks
+    for _ in range(3 + n_players):
+        byte = record[pos]
+        if byte < 0x80:  # most of the varints are one byte
+            amounts.append(byte)
+            pos += 1
+        else:
+            value, pos = _get_varint(record, pos)
+            amounts.append(value)
+    ante, bblind, uncalled = amounts[:3]
+    stacks = array('l', amounts[3:])
+
+    holecards = array('b', bytes(record[pos:pos + 2 * n_players]))
+    pos += 2 * n_players
+    n_board = record[pos]
+    boardcards = array('b', bytes(record[pos + 1:pos + 1 + n_board]))
+    pos += 1 + n_board
+
+    winner_index = record[pos]
+    pos += 1
+    if winner_index == _NO_WINNER_INDEX:
+        winner, pos = _get_name(record, pos)
+    players = []
+    for _ in range(n_players):
+        name, pos = _get_name(record, pos)
+        players.append(name)
+    if winner_index != _NO_WINNER_INDEX:
+        winner = players[winner_index]
+
+    n_actions, pos = _get_varint(record, pos)
+    sequence = []
+    for _ in range(n_actions):
+        code = record[pos]
+        pos += 1
+        if code == RAISE:
+            cents, pos = _get_varint(record, pos)
+            sequence.append('r' + cents2str(cents))
+        else:
+            sequence.append(ACTION_CHARS[code])
+
+    return ParsedHand(ante, bblind, stacks, ''.join(sequence), holecards, boardcards, winner, tuple(players),
+                      uncalled)
+
+
+class BinaryReader:
+    """
+    Iterate the records of a binary file. The file is mapped in memory and never read as a whole,
+    each record is copied once from the map into the bytearray it is decoded from (decoding straight from a
+    memoryview of the map is slower, its indexing costs more than the copy of a small record).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if size and self._mmap[:len(_FILE_HEADER)] != _FILE_HEADER:
+            self.close()
+            raise ValueError('{} is not a version {} ACPC binary file'.format(path, VERSION))
+
+    def offsets(self):
+        """
+        Generator over the (offset, length) of the records, in the map
+        """
+        data = self._mmap
+        pos = len(_FILE_HEADER)
+        end = len(data)
+        while pos < end:
+            length = _LENGTH.unpack_from(data, pos)[0]
+            pos += _LENGTH.size
+            yield pos, length
+            pos += length
+
+    if bytes is str:  # python 2
+        def __iter__(self):
+            data = self._mmap
+            for offset, length in self.offsets():
+                yield decode_hand(bytearray(buffer(data, offset, length)))
+    else:
+        def __iter__(self):
+            view = memoryview(self._mmap)
+            try:
+                for offset, length in self.offsets():
+                    yield decode_hand(bytearray(view[offset:offset + length]))
+            finally:
+                view.release()  # the map can not be closed while exported
+
+    def close(self):
+        if not isinstance(self._mmap, bytes):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of PS2acpc results, keyed by a hash of the hand text and the parser version.
+
+with ParseCache('acpc_cache.sqlite', max_entries=5000000) as cache:
+    for hand in iter_hands('archive.txt'):
+        acpc = cache.PS2acpc(hand)
+    print(cache.stats())
+
+Entries of another PARSER_VERSION are dropped when the cache is opened. When the cache holds more than
+max_entries, the least recently used entries are evicted.
+"""
+
+import pickle
+import hashlib
+import sqlite3
+
+from HH_tools import PS2acpc, PARSER_VERSION
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS acpc (
+    key BLOB PRIMARY KEY,
+    version INTEGER,
+    value BLOB,
+    used INTEGER
+);
+CREATE INDEX IF NOT EXISTS acpc_used ON acpc (used);
+"""
+
+
+def hand_key(ps_text, version=PARSER_VERSION):
+    """
+    sha1 of the parser version and the hand text
+    """
+    data = ps_text if isinstance(ps_text, bytes) else ps_text.encode('utf-8')
+    return sqlite3.Binary(hashlib.sha1(('{}:'.format(version)).encode('ascii') + data).digest())
+
+
+class ParseCache:
+    """
+    sqlite backed cache of PS2acpc tuples. Writes are committed every commit_every operations and on close.
+    """
+
+    def __init__(self, path, max_entries=1000000, version=PARSER_VERSION, commit_every=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+        with self._db:
+            self._db.execute("DELETE FROM acpc WHERE version != ?", (version,))
+        self._count = self._db.execute("SELECT COUNT(*) FROM acpc").fetchone()[0]
+        self._clock = self._db.execute("SELECT MAX(used) FROM acpc").fetchone()[0] or 0
+        self._pending = 0
+
+    def get(self, ps_text):
+        """
+        Return the cached PS2acpc tuple of the hand, or None
+        """
+        key = hand_key(ps_text, self.version)
+        row = self._db.execute("SELECT value FROM acpc WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._clock += 1
+        self._db.execute("UPDATE acpc SET used = ? WHERE key = ?", (self._clock, key))
+        self._written()
+        return pickle.loads(bytes(row[0]))
+
+    def put(self, ps_text, acpc):
+        self._clock += 1
+        key = hand_key(ps_text, self.version)
+        value = sqlite3.Binary(pickle.dumps(acpc, 2))
+        # the rowcount of a REPLACE is 1 as for a new row, only the rows actually inserted are counted
+        cursor = self._db.execute("INSERT OR IGNORE INTO acpc VALUES (?, ?, ?, ?)",
+                                  (key, self.version, value, self._clock))
+        if cursor.rowcount == 1:
+            self._count += 1
+        else:
+            self._db.execute("UPDATE acpc SET value = ?, used = ? WHERE key = ?", (value, self._clock, key))
+        if self._count > self.max_entries:
+            self._evict()
+        self._written()
+
+    def PS2acpc(self, ps_text):
+        """
+        Same as HH_tools.PS2acpc, from the cache when the hand was already converted. Errors are not cached.
+        """
+        acpc = self.get(ps_text)
+        if acpc is None:
+            acpc = PS2acpc(ps_text)
+            self.put(ps_text, acpc)
+        return acpc
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / float(lookups) if lookups else None, 'entries': self._count}
+
+    def _evict(self):
+        """
+        Remove the least recently used entries, down to 90% of max_entries so evictions are not done on every put
+        """
+        n_evict = self._count - int(self.max_entries * 0.9)
+        self._db.execute("DELETE FROM acpc WHERE key IN (SELECT key FROM acpc ORDER BY used LIMIT ?)", (n_evict,))
+        self._count -= n_evict
+        self.evictions += n_evict
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self._db.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Integer forms of the cards, positions and actions, shared by the parser, the replay and the record formats.
+
+cards: ints from 0 to 51, rank * 4 + suit, the same as firepoker.Hand.Card2Str. -1 when unknown
+positions: indexes in the POSITION_NAMES sublist of the hand (HandHistory.pos_name_lst), 0 is the BTN
+actions: (type, cents) pairs, type FOLD, CALL, STREET (the '/' between rounds) or RAISE, cents is the raise to
+    amount of a RAISE and 0 otherwise
+chips: ints in cents
+
+The PS2acpc tuple keeps the strings ('AcAd', 'BTN', 'r40.00c/'). The record formats (HH_record, HH_binary,
+HH_columns), HH_equity and replay_sequence make the ints with cards2ints, POSITION_INDEX, to_cents and
+parse_sequence, and give the strings back with CARDS, POSITION_NAMES and cents2str. The parser sums its amounts
+in cents.
+"""
+
+try:
+    from sys import intern  # python 3, intern is a builtin in python 2
+except ImportError:
+    pass
+
+#########
+# Cards #
+#########
+
+SUITS = 'cshd'  # same as firepoker.Hand.suits and values
+VALUES = '23456789TJQKA'
+
+CARDS = [intern(value + suit) for value in VALUES for suit in SUITS]  # card int: card string
+CARD_INDEX = dict((card, i) for i, card in enumerate(CARDS))
+
+
+def cards2ints(cards_str):
+    """
+    'AcKd' -> [48, 47]
+    """
+    return [CARD_INDEX[cards_str[i:i + 2]] for i in range(0, len(cards_str), 2)]
+
+
+#############
+# Positions #
+#############
+
+# position names by number of players - 2, in position index order
+POSITION_NAMES = [
+        ["BTN", "BB"],
+        ["BTN", "SB", "BB"],
+        ["BTN", "SB", "BB", "CO"],
+        ["BTN", "SB", "BB", "UTG", "CO"],
+        ["BTN", "SB", "BB", "UTG", "MP1", "CO"],
+        ["BTN", "SB", "BB", "UTG", "MP1", "MP2", "CO"],
+        ["BTN", "SB", "BB", "UTG", "MP1", "MP2", "MP3", "CO"],
+        ["BTN", "SB", "BB", "UTG", "UTG+1", "MP1", "MP2", "MP3", "CO"],
+        ["BTN", "SB", "BB", "UTG", "UTG+1", "UTG+2", "MP1", "MP2", "MP3", "CO"],
+    ]
+# position name: index, by number of players - 2
+POSITION_INDEX = [dict((pos, i) for i, pos in enumerate(positions)) for positions in POSITION_NAMES]
+
+
+###########
+# Amounts #
+###########
+
+def to_cents(amount):
+    """
+    Chips (number or string, eg '12.34') to cents, rounded so 0.29 gives 29
+    """
+    return int(round(float(amount) * 100))
+
+
+def cents2str(cents):
+    """
+    29 -> '0.29', the same as '{0:.2f}' of the amount in chips, without the float
+    """
+    if cents < 0:
+        return '-' + cents2str(-cents)
+    return '%d.%02d' % divmod(cents, 100)
+
+
+###########
+# Actions #
+###########
+
+FOLD, CALL, STREET, RAISE = range(4)
+ACTION_CHARS = 'fc/r'  # action type: ACPC character
+_ACTION_TYPES = {'f': FOLD, 'c': CALL, '/': STREET}
+
+_SEQUENCE_CACHE_SIZE = 1 << 16
+_sequence_cache = {}  # sequence string: actions, cleared when full (the same sequences come back on many hands)
+
+
+def parse_sequence(sequence):
+    """
+    'r40.00cf/c' -> ((RAISE, 4000), (CALL, 0), (FOLD, 0), (STREET, 0), (CALL, 0))
+    :return: tuple of (type, cents)
+    """
+    actions = _sequence_cache.get(sequence)
+    if actions is not None:
+        return actions
+
+    actions = []
+    i = 0
+    n_chars = len(sequence)
+    while i < n_chars:
+        char = sequence[i]
+        if char == 'r':
+            end = i + 1
+            while end < n_chars and sequence[end] not in 'fcr/':
+                end += 1
+            actions.append((RAISE, to_cents(sequence[i + 1:end])))
+            i = end
+        else:
+            actions.append((_ACTION_TYPES[char], 0))
+            i += 1
+    actions = tuple(actions)
+
+    if len(_sequence_cache) >= _SEQUENCE_CACHE_SIZE:
+        _sequence_cache.clear()
+    _sequence_cache[sequence] = actions
+    return actions
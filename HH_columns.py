@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar export of parsed hands into NumPy structured arrays, by chunks of fixed size.
+
+for chunk in iter_chunks(FastHandHistory(hand) for hand in iter_hands('hands_example.txt')):
+    vpip_like = (chunk['actions'][:, 0, ACTION_RAISE] > 0).mean()
+
+Positions are indexes in the HandHistory.pos_name_lst sublist of the hand, cards are ints from 0 to 51
+(same as firepoker.Hand.Card2Str), chips are ints in cents. Missing values are -1.
+"""
+
+import numpy as np
+
+from HH_tools import HandHistory
+from HH_codec import FOLD, CALL, STREET, RAISE, cards2ints, to_cents, parse_sequence
+
+_pos_name_lst = HandHistory.pos_name_lst
+MAX_PLAYERS = len(_pos_name_lst[-1])
+
+# last axis of the 'actions' field, counts of each action type per street
+ACTION_FOLD = 0
+ACTION_CALL = 1  # check or call
+ACTION_RAISE = 2  # bet or raise
+_action_index = {FOLD: ACTION_FOLD, CALL: ACTION_CALL, RAISE: ACTION_RAISE}
+
+HAND_DTYPE = np.dtype([
+    ('n_players', np.int8),
+    ('ante', np.int64),
+    ('bblind', np.int64),
+    ('uncalled', np.int64),
+    ('stacks', np.int64, (MAX_PLAYERS,)),
+    ('winner', np.int8),
+    ('boardcards', np.int8, (5,)),
+    ('holecards', np.int8, (MAX_PLAYERS, 2)),
+    ('actions', np.int16, (4, 3)),  # street, action type
+])
+
+
+def hand_row(hand):
+    """
+    Tuple of the HAND_DTYPE fields for a parsed HandHistory
+    """
+    n_players = len(hand.stacks)
+    positions = _pos_name_lst[n_players - 2]
+
+    stacks = [-1] * MAX_PLAYERS
+    holecards = [[-1, -1] for _ in range(MAX_PLAYERS)]
+    winner = -1
+    for i, pos in enumerate(positions):
+        stacks[i] = to_cents(hand.stacks[pos])
+        cards = hand.holecards.get(pos)
+        if cards is not None:
+            holecards[i] = cards2ints(cards)
+        if hand.players.get(pos) == hand.winner:
+            winner = i
+
+    boardcards = cards2ints(hand.boardcards.replace('/', ''))
+    boardcards += [-1] * (5 - len(boardcards))
+
+    actions = [[0, 0, 0] for _ in range(4)]
+    street = 0
+    for action_type, cents in parse_sequence(hand.sequence):
+        if action_type == STREET:
+            street += 1
+        else:
+            actions[street][_action_index[action_type]] += 1
+
+    return (n_players, to_cents(hand.ante), to_cents(hand.bblind), to_cents(hand.uncalledbet), stacks, winner,
+            boardcards, holecards, actions)
+
+
+class ColumnExporter(object):
+    """
+    Accumulate hands into a preallocated structured array of chunk_size rows.
+    append() returns the chunk once it is full, flush() returns the last partial one.
+    """
+
+    def __init__(self, chunk_size=1 << 16):
+        self.chunk_size = chunk_size
+        self._chunk = np.empty(chunk_size, dtype=HAND_DTYPE)
+        self._n_rows = 0
+
+    def append(self, hand):
+        self._chunk[self._n_rows] = hand_row(hand)
+        self._n_rows += 1
+        if self._n_rows == self.chunk_size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """
+        Return the rows appended since the last chunk (possibly empty), a new buffer is used afterwards
+        """
+        chunk = self._chunk[:self._n_rows]
+        self._chunk = np.empty(self.chunk_size, dtype=HAND_DTYPE)
+        self._n_rows = 0
+        return chunk
+
+
+def iter_chunks(hands, chunk_size=1 << 16):
+    """
+    Yield structured arrays of at most chunk_size rows from an iterable of parsed hands
+    """
+    exporter = ColumnExporter(chunk_size)
+    for hand in hands:
+        chunk = exporter.append(hand)
+        if chunk is not None:
+            yield chunk
+    chunk = exporter.flush()
+    if len(chunk):
+        yield chunk
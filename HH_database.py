@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk load of converted hands into a sqlite database, one row per hand, player and action.
+
+with HandDatabase('hands.db') as db:
+    db.load_files(['histories/'])
+    for hand_id in db.hand_ids(player='DawiC', min_preflop_raises=3):  # 4-bet pots of DawiC
+        print(db.actions(hand_id))
+
+Hands are inserted by chunks (executemany, one transaction per chunk), the database is in WAL mode and the indexes
+are dropped during a load as large as the database (into an empty one, or once the load reaches as many hands as the
+database had) and created again after it, a small load updates them. Hand IDs already in the database are skipped, so the same
+files can be loaded again.
+The actions are the ones written by acpc2PS (see _player_actions), when the sequence can be replayed.
+"""
+
+import re
+import sqlite3
+from collections import namedtuple
+
+from HH_tools import iter_hands, PS2acpc, replay_sequence, _player_actions, _pos_name_lst
+from HH_batch import list_files
+
+_RE_HAND_ID = re.compile(r'PokerStars Hand #(\d+):(?: *Tournament #(\d+))?')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hands (
+    hand_id INTEGER PRIMARY KEY,
+    tournament_id INTEGER,
+    n_players INTEGER,
+    ante REAL,
+    bblind REAL,
+    sequence TEXT,
+    boardcards TEXT,
+    winner TEXT,
+    uncalled REAL,
+    pot REAL,  -- NULL when the sequence can not be replayed
+    preflop_raises INTEGER  -- 1: open raise, 2: 3-bet, 3: 4-bet..
+);
+CREATE TABLE IF NOT EXISTS players (
+    hand_id INTEGER,
+    position TEXT,
+    name TEXT,
+    stack REAL,
+    holecards TEXT
+);
+CREATE TABLE IF NOT EXISTS actions (
+    hand_id INTEGER,
+    number INTEGER,  -- order of the action in the hand
+    street INTEGER,  -- 0 preflop .. 3 river
+    position TEXT,
+    name TEXT,
+    action TEXT,  -- folds, checks, calls, bets, raises
+    amount REAL,  -- called, bet or raised by
+    raise_to REAL,
+    allin INTEGER
+);
+"""
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS players_name ON players (name);
+CREATE INDEX IF NOT EXISTS players_hand ON players (hand_id);
+CREATE INDEX IF NOT EXISTS actions_hand ON actions (hand_id);
+CREATE INDEX IF NOT EXISTS hands_tournament ON hands (tournament_id);
+CREATE INDEX IF NOT EXISTS hands_preflop_raises ON hands (preflop_raises);
+"""
+_DROP_INDEXES = """
+DROP INDEX IF EXISTS players_name;
+DROP INDEX IF EXISTS players_hand;
+DROP INDEX IF EXISTS actions_hand;
+DROP INDEX IF EXISTS hands_tournament;
+DROP INDEX IF EXISTS hands_preflop_raises;
+"""
+
+# loaded: hands inserted, skipped: hand IDs already loaded (or twice in the input), errors: hands PS2acpc failed on
+LoadResult = namedtuple('LoadResult', ['loaded', 'skipped', 'errors'])
+
+
+def hand_rows(hand_id, tournament_id, acpc):
+    """
+    Rows of one hand for the hands, players and actions tables
+    :return: (hand row, list of player rows, list of action rows)
+    """
+    ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+    try:
+        replayed, final_pot = replay_sequence(stacks, sequence, bblind)
+    except Exception:  # the actions are not loaded, the rest of the hand is
+        replayed, pot = [], None
+    else:
+        pot = final_pot / 100.0 - uncalled
+
+    hand_row = (hand_id, tournament_id, len(stacks), float(ante), float(bblind), sequence, boardcards, winner,
+                float(uncalled), pot, sequence.split('/')[0].count('r'))
+    player_rows = [(hand_id, pos, players[pos], stacks[pos], holecards.get(pos))
+                   for pos in _pos_name_lst[len(stacks) - 2]]
+
+    position_of = dict((name, pos) for pos, name in players.items())
+    action_rows = []
+    for street, street_actions in enumerate(_player_actions(replayed, players)):
+        for action in street_actions:
+            name, action_name = action[0], action[1]
+            amount = action[2] if len(action) > 2 else None
+            raise_to = allin = None
+            if action_name == 'raises':
+                raise_to, allin = action[3], int(action[4])
+            elif action_name == 'calls':
+                allin = int(action[3])
+            action_rows.append((hand_id, len(action_rows), street, position_of.get(name, name), name, action_name,
+                                amount, raise_to, allin))
+    return hand_row, player_rows, action_rows
+
+
+class HandDatabase:
+    """
+    sqlite database of converted hands, see the module docstring
+    """
+
+    def __init__(self, path, chunk_size=500):
+        """
+        :param path: sqlite file, created if needed
+        :param chunk_size: hands inserted by transaction (at most 999, the hand IDs of a chunk are looked up at once)
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM hands").fetchone()[0]
+
+    ########
+    # Load #
+    ########
+
+    def load(self, hands):
+        """
+        Convert and insert hands. Once the load has as many hands as the database had, the indexes are dropped for
+        the rest of it: rebuilding them once is then faster than updating them on every insert. They are created
+        again even when the load fails
+        :param hands: iterable of PokerStars hand texts
+        :return: LoadResult
+        """
+        loaded = skipped = errors = 0
+        chunk = []
+        n_hands = 0  # hands read from the input
+        n_rows = len(self)  # hands in the database before the load
+        dropped = False
+        try:
+            for hand in hands:
+                n_hands += 1
+                reg_hand = _RE_HAND_ID.search(hand)
+                if reg_hand is None:
+                    errors += 1
+                    continue
+                chunk.append((int(reg_hand.group(1)), int(reg_hand.group(2)) if reg_hand.group(2) else None, hand))
+                if len(chunk) == self.chunk_size:
+                    dropped = dropped or self._drop_indexes(n_hands, n_rows)
+                    result = self._load_chunk(chunk)
+                    loaded, skipped, errors = loaded + result[0], skipped + result[1], errors + result[2]
+                    chunk = []
+            if chunk:
+                dropped = dropped or self._drop_indexes(n_hands, n_rows)
+                result = self._load_chunk(chunk)
+                loaded, skipped, errors = loaded + result[0], skipped + result[1], errors + result[2]
+        finally:
+            self._db.executescript(_INDEXES)
+        return LoadResult(loaded, skipped, errors)
+
+    def load_files(self, paths, pattern='*.txt'):
+        """
+        Load every hand of the given files and directories
+        :return: LoadResult
+        """
+        def hands():
+            for path in list_files(paths, pattern):
+                for hand in iter_hands(path):
+                    yield hand
+        return self.load(hands())
+
+    def _drop_indexes(self, n_hands, n_rows):
+        """
+        Drop the indexes when the n_hands read by the load are as many as the n_rows of the database before it
+        :return: True if they are dropped
+        """
+        if n_hands < n_rows:
+            return False
+        self._db.executescript(_DROP_INDEXES)
+        return True
+
+    def _load_chunk(self, chunk):
+        db = self._db
+        known = set(row[0] for row in db.execute(
+            "SELECT hand_id FROM hands WHERE hand_id IN ({})".format(','.join('?' * len(chunk))),
+            [hand_id for hand_id, tournament_id, hand in chunk]))
+
+        new_hands = []
+        new_players = []
+        new_actions = []
+        skipped = errors = 0
+        for hand_id, tournament_id, hand in chunk:
+            if hand_id in known:
+                skipped += 1
+                continue
+            try:
+                rows = hand_rows(hand_id, tournament_id, PS2acpc(hand))
+            except Exception:
+                errors += 1
+                continue
+            known.add(hand_id)
+            new_hands.append(rows[0])
+            new_players.extend(rows[1])
+            new_actions.extend(rows[2])
+
+        with db:
+            db.executemany("INSERT INTO hands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", new_hands)
+            db.executemany("INSERT INTO players VALUES (?, ?, ?, ?, ?)", new_players)
+            db.executemany("INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", new_actions)
+        return len(new_hands), skipped, errors
+
+    ###########
+    # Lookups #
+    ###########
+
+    def hand_ids(self, player=None, tournament_id=None, min_preflop_raises=None):
+        """
+        Return the hand IDs matching all the given criteria, in hand ID order
+        """
+        query = "SELECT hands.hand_id FROM hands"
+        conditions = []
+        params = []
+        if player is not None:
+            query += " JOIN players ON players.hand_id = hands.hand_id"
+            conditions.append("players.name = ?")
+            params.append(player)
+        if tournament_id is not None:
+            conditions.append("hands.tournament_id = ?")
+            params.append(tournament_id)
+        if min_preflop_raises is not None:
+            conditions.append("hands.preflop_raises >= ?")
+            params.append(min_preflop_raises)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY hands.hand_id"
+        return [row[0] for row in self._db.execute(query, params)]
+
+    def actions(self, hand_id):
+        """
+        Return the actions of a hand, as (street, position, name, action, amount, raise_to, allin) rows
+        """
+        return self._db.execute("SELECT street, position, name, action, amount, raise_to, allin FROM actions "
+                                "WHERE hand_id = ? ORDER BY number", (hand_id,)).fetchall()
+
+    def execute(self, query, params=()):
+        """
+        Run any query on the database, eg joins the lookups above do not cover
+        """
+        return self._db.execute(query, params)
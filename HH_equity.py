@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+All-in equity of converted hands, for results adjusted by the expected value of the all-in.
+
+for result in allin_evs(PS2acpc(hand) for hand in iter_hands('archive.txt')):
+    if result.allin is not None:
+        print(result.allin.positions, result.equities, result.evs)
+
+A hand is an all-in when the betting ended before the river with a player all-in, and the cards of all the players
+left are known. The remaining board cards are enumerated when there are at most max_enumeration boards,
+sampled otherwise, and every board is evaluated with firepoker.Evaluator.
+The equity is taken on the whole pot, side pots are not split.
+"""
+
+import itertools
+import traceback
+import multiprocessing
+from collections import namedtuple
+
+import numpy as np
+
+from HH_tools import HandHistory, replay_sequence
+from HH_codec import cards2ints
+from HH_batch import imap_bounded
+from firepoker.Evaluator import evaluate
+
+N_SAMPLES = 10000  # boards sampled when they are not enumerated
+MAX_ENUMERATION = 20000  # every board is evaluated when there are at most this many (from the flop and the turn)
+
+_pos_name_lst = HandHistory.pos_name_lst
+_DECK = np.arange(52)
+_BOARD_SIZES = (0, 3, 4)  # known board cards when the betting ends on the preflop, the flop, the turn
+
+# positions: players left, by position order. holecards: list of [card, card], boardcards: known board cards
+# (ints of HH_codec), pot: in chips, round: last betting round (0 preflop .. 2 turn)
+AllIn = namedtuple('AllIn', ['positions', 'holecards', 'boardcards', 'pot', 'round'])
+# allin: AllIn or None when the hand is not an all-in, equities and evs: dict position: share of the pot, chips
+AllInResult = namedtuple('AllInResult', ['index', 'allin', 'equities', 'evs', 'error'])
+
+
+def equity(holecards, boardcards=(), n_samples=N_SAMPLES, rng_seed=0, max_enumeration=MAX_ENUMERATION):
+    """
+    Share of the pot won by each player over the remaining boards, ties are split
+    :param holecards: list of [card, card], one per player
+    :param boardcards: known board cards, 0 to 5
+    :param rng_seed: seed of the sampled boards, an int or a sequence of ints
+    :return: float array, one equity per player
+    """
+    holecards = np.asarray(holecards, dtype=np.int32)
+    known = np.asarray(boardcards, dtype=np.int32)
+    deck = np.setdiff1d(_DECK, np.concatenate([holecards.ravel(), known]))
+    n_missing = 5 - len(known)
+
+    n_boards = 1
+    for i in range(n_missing):
+        n_boards = n_boards * (len(deck) - i) // (i + 1)
+    if n_boards <= max_enumeration:
+        missing = np.array(list(itertools.combinations(deck, n_missing)), np.int32).reshape(n_boards, n_missing)
+    else:
+        rng = np.random.RandomState(rng_seed)
+        missing = deck[rng.rand(n_samples, len(deck)).argpartition(n_missing, axis=1)[:, :n_missing]]
+    boards = np.concatenate([np.broadcast_to(known, (len(missing), len(known))), missing], axis=1)
+
+    ranks = np.array([evaluate(np.broadcast_to(cards, (len(boards), 2)), boards) for cards in holecards])
+    winners = ranks == ranks.max(axis=0)
+    return (winners / winners.sum(axis=0).astype(float)).mean(axis=1)
+
+
+def allin_situation(acpc):
+    """
+    :param acpc: PS2acpc tuple
+    :return: AllIn, or None when the hand is not an all-in before the river, or the cards are not all shown
+    """
+    ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+    replayed, final_pot = replay_sequence(stacks, sequence, bblind)
+    if not replayed or not any(action.allin for action in replayed):
+        return None
+    last_round = replayed[-1].round
+    if last_round >= len(_BOARD_SIZES):
+        return None
+
+    folded = set(action.position for action in replayed if action.action == 'f')
+    positions = [pos for pos in _pos_name_lst[len(stacks) - 2] if pos not in folded]
+    if len(positions) < 2 or any(pos not in holecards for pos in positions):
+        return None
+
+    board = cards2ints(boardcards.replace('/', ''))[:_BOARD_SIZES[last_round]]
+    return AllIn(positions, [cards2ints(holecards[pos]) for pos in positions], board,
+                 final_pot / 100.0 - uncalled, last_round)
+
+
+def allin_ev(acpc, n_samples=N_SAMPLES, rng_seed=0):
+    """
+    :return: (AllIn, equities, evs) of the hand, equities and evs are dicts by position. None if not an all-in
+    """
+    allin = allin_situation(acpc)
+    if allin is None:
+        return None
+    equities = equity(allin.holecards, allin.boardcards, n_samples, rng_seed)
+    return (allin, dict(zip(allin.positions, equities.tolist())),
+            dict((pos, share * allin.pot) for pos, share in zip(allin.positions, equities.tolist())))
+
+
+def _allin_job(job):
+    """
+    Worker function, never raises so one bad hand does not stop the batch
+    """
+    index, acpc, n_samples, rng_seed = job
+    try:
+        result = allin_ev(acpc, n_samples, [rng_seed, index])  # same boards whatever the worker
+    except Exception:
+        return AllInResult(index, None, None, None, traceback.format_exc().strip())
+    if result is None:
+        return AllInResult(index, None, None, None, None)
+    return AllInResult(index, result[0], result[1], result[2], None)
+
+
+def allin_evs(records, workers=1, n_samples=N_SAMPLES, rng_seed=0, chunksize=64):
+    """
+    All-in EV of many hands, over a process pool when workers is not 1.
+    The boards sampled for a hand only depend on rng_seed and the index of the hand, so the results
+    are the same with any number of workers.
+
+    :param records: iterable of PS2acpc tuples
+    :param workers: number of processes, None for the number of cpus. 1 computes in the current process
+    :param chunksize: number of hands sent to a worker at once
+    :return: yields an AllInResult per hand, in order
+    """
+    jobs = ((index, acpc, n_samples, rng_seed) for index, acpc in enumerate(records))
+
+    if workers == 1:
+        for job in jobs:
+            yield _allin_job(job)
+        return
+
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in imap_bounded(pool, _allin_job, jobs, chunksize, workers * chunksize * 4):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Follow hand history files while the tables write them, and emit each hand once it is complete.
+
+follower = HandFollower(['table1.txt', 'table2.txt'], checkpoint='follow.json')
+for path, hand in follower.follow(interval=2):
+    print(PS2acpc(hand))
+
+Only the bytes appended since the last poll are read, at most max_chunks chunks of a file per poll: a backlog is
+read over the next polls instead of being loaded at once. A hand is complete when the next hand has started,
+or when its SUMMARY part is closed by a blank line; until then it stays in a buffer.
+The offsets are saved in the checkpoint once the hands of a poll are consumed: follow() saves when it is resumed
+after the last hand of a poll, a caller of poll() calls save() when it is done with the hands. Delivery is at least
+once, a crash while the hands of a poll are handled emits them again on restart, but a restart never loses a hand.
+"""
+
+import os
+import json
+import time
+
+from HH_tools import _HAND_HEADER
+
+_HEADER = _HAND_HEADER.encode('ascii')
+_SUMMARY = b'*** SUMMARY ***'  # the last part of a hand, see HandHistory.part_parse
+_BLANK_LINES = (b'\n\n', b'\r\n\r\n')
+
+
+def _to_text(data, encoding):
+    if isinstance(data, str):  # python 2, bytes are str
+        return data
+    return data.decode(encoding, 'replace')
+
+
+class _FileState:
+    def __init__(self, offset=0):
+        self.offset = offset  # file offset of the beginning of the buffer, everything before is emitted
+        self.buffer = b''
+
+
+class HandFollower:
+    """
+    Incremental reader of a set of history files, keeping a byte offset for each file
+    """
+
+    def __init__(self, paths, checkpoint=None, encoding='utf-8', chunk_size=1 << 16, max_chunks=16):
+        """
+        :param paths: history files to follow, they do not have to exist yet
+        :param checkpoint: json file where the offsets are saved, and read back at start
+        :param encoding: encoding of the history files
+        :param chunk_size: bytes read at once
+        :param max_chunks: chunks read from a file at most in a poll
+        """
+        self.checkpoint = checkpoint
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+
+        offsets = {}
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as fh:
+                offsets = json.load(fh)
+        self._unsaved = False  # offsets moved since the last save
+        self._files = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            self._files[path] = _FileState(offsets.get(path, 0))
+
+    def add(self, path):
+        """
+        Follow one more file, from its start
+        """
+        self._files.setdefault(os.path.abspath(path), _FileState())
+
+    def offsets(self):
+        return dict((path, state.offset) for path, state in self._files.items())
+
+    def poll(self):
+        """
+        Read what was appended to the files since the last poll. The offsets are not saved, call save() once the
+        hands are handled
+        :return: list of (path, hand text) for the hands completed since then
+        """
+        completed = []
+        for path in sorted(self._files):
+            state = self._files[path]
+            previous_offset = state.offset
+            self._read(path, state)
+            for hand in self._split_complete(state):
+                completed.append((path, _to_text(hand, self.encoding)))
+            self._unsaved = self._unsaved or state.offset != previous_offset
+        return completed
+
+    def follow(self, interval=1.0):
+        """
+        Generator polling the files forever, waiting interval seconds when nothing new was completed.
+        The checkpoint is saved when the consumer asks for the hand after the last one of a poll
+        """
+        while True:
+            completed = self.poll()
+            for path_hand in completed:
+                yield path_hand
+            if self._unsaved and self.checkpoint is not None:
+                self.save()
+            if not completed:
+                time.sleep(interval)
+
+    def save(self):
+        """
+        Write the offsets to the checkpoint file, through a temporary file so a crash does not leave it half written
+        """
+        temp_name = self.checkpoint + '.tmp'
+        with open(temp_name, 'w') as fh:
+            json.dump(self.offsets(), fh)
+        try:
+            os.rename(temp_name, self.checkpoint)
+        except OSError:  # windows does not replace an existing file
+            os.remove(self.checkpoint)
+            os.rename(temp_name, self.checkpoint)
+        self._unsaved = False
+
+    def _read(self, path, state):
+        try:
+            size = os.path.getsize(path)
+        except OSError:  # not created yet
+            return
+        if size < state.offset + len(state.buffer):  # truncated or replaced, start again
+            state.offset = 0
+            state.buffer = b''
+        if size == state.offset + len(state.buffer):
+            return
+
+        chunks = [state.buffer]
+        with open(path, 'rb') as fh:
+            fh.seek(state.offset + len(state.buffer))
+            for _ in range(self.max_chunks):  # the rest is read by the next polls
+                chunk = fh.read(self.chunk_size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        state.buffer = b''.join(chunks)
+
+    @staticmethod
+    def _split_complete(state):
+        """
+        Remove the complete hands from the buffer and return them, the offset is moved after them
+        """
+        buf = state.buffer
+        start = buf.find(_HEADER)
+        if start == -1:  # keep what may be the beginning of a header
+            keep_from = max(0, len(buf) - len(_HEADER) + 1)
+            state.offset += keep_from
+            state.buffer = buf[keep_from:]
+            return []
+
+        completed = []
+        next_start = buf.find(_HEADER, start + 1)
+        while next_start != -1:
+            completed.append(buf[start:next_start].strip())
+            start = next_start
+            next_start = buf.find(_HEADER, start + 1)
+
+        # the last hand is complete once its summary is followed by a blank line
+        summary = buf.find(_SUMMARY, start)
+        if summary != -1:
+            ends = []
+            for blank in _BLANK_LINES:
+                blank_index = buf.find(blank, summary)
+                if blank_index != -1:
+                    ends.append(blank_index + len(blank))
+            if ends:  # stop at the blank line, what follows may be the beginning of the next header
+                end = min(ends)
+                completed.append(buf[start:end].strip())
+                start = end
+
+        state.offset += start
+        state.buffer = buf[start:]
+        return completed
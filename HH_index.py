@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Random access index over a hand history archive.
+
+The archive is scanned once, the index (sqlite file next to the archive) keeps for each hand its byte offset
+and length, hand and tournament IDs, table name, max seats and player names.
+Lookups mmap the archive and only parse the requested hands.
+
+index = HandIndex('archive.txt')  # built on first use, updated when the archive grew, rebuilt when it shrank
+hand = index.get(139543339921)  # FastHandHistory
+for hand in index.hands_of_player('DawiC'):
+    print(hand.sequence)
+"""
+
+import os
+import re
+import mmap
+import sqlite3
+
+from HH_tools import FastHandHistory, _HAND_HEADER
+
+_HEADER = _HAND_HEADER.encode('ascii')
+_RE_HAND_ID = re.compile(br'PokerStars Hand #(\d+):(?: *Tournament #(\d+))?')
+_RE_TABLE = re.compile(br"Table '([^']*)' (\d+)-max")
+_RE_SEAT_NAME = re.compile(br'Seat \d+: (.+) \(\$?[0-9-.]+')  # same name as HandHistory.parse_hand
+_PART = b'\n*** '  # the seats are before the first part
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+CREATE TABLE IF NOT EXISTS hands (
+    hand_id INTEGER PRIMARY KEY,
+    tournament_id INTEGER,
+    table_name TEXT,
+    max_seat INTEGER,
+    offset INTEGER,
+    length INTEGER
+);
+CREATE TABLE IF NOT EXISTS players (hand_id INTEGER, name TEXT);
+"""
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS players_name ON players (name);
+CREATE INDEX IF NOT EXISTS hands_tournament ON hands (tournament_id);
+"""
+
+
+def _decode(data):
+    return data.decode('utf-8', 'replace')
+
+
+def scan_hands(data, start=0):
+    """
+    Generator over the hands of an archive (a mmap or bytes), without parsing them.
+    :param start: offset the scan starts from
+    :return: yields (hand_id, tournament_id, table_name, max_seat, offset, length, player names)
+    """
+    start = data.find(_HEADER, start)
+    while start != -1:
+        end = data.find(_HEADER, start + 1)
+        length = (end if end != -1 else len(data)) - start
+
+        # only the lines before the first part are read
+        part = data.find(_PART, start, start + length)
+        header = data[start:part if part != -1 else start + length]
+        reg_hand = _RE_HAND_ID.match(header)
+        if reg_hand is not None:
+            reg_table = _RE_TABLE.search(header)
+            names = [_decode(name) for name in _RE_SEAT_NAME.findall(header)]
+            yield (int(reg_hand.group(1)),
+                   int(reg_hand.group(2)) if reg_hand.group(2) else None,
+                   _decode(reg_table.group(1)) if reg_table else None,
+                   int(reg_table.group(2)) if reg_table else None,
+                   start, len(data[start:start + length].rstrip()), names)
+        start = end
+
+
+class HandIndex:
+    """
+    Index of one history file, see the module docstring
+    """
+
+    def __init__(self, history_path, index_path=None, parser=FastHandHistory):
+        """
+        :param history_path: the archive
+        :param index_path: sqlite file of the index, history_path + '.idx' by default
+        :param parser: class used to parse the hands, HandHistory or FastHandHistory
+        """
+        self.history_path = history_path
+        self.index_path = index_path if index_path is not None else history_path + '.idx'
+        self.parser = parser
+        self._db = sqlite3.connect(self.index_path)
+        self._db.executescript(_SCHEMA)
+
+        self._file = open(history_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        indexed_size = self._db.execute("SELECT value FROM meta WHERE key = 'size'").fetchone()
+        if indexed_size is None or indexed_size[0] > size:
+            self.build()
+        elif indexed_size[0] < size:
+            self.update()
+
+    def build(self):
+        """
+        Scan the whole archive and replace the index
+        """
+        db = self._db
+        with db:
+            db.execute("DELETE FROM hands")
+            db.execute("DELETE FROM players")
+            db.execute("DROP INDEX IF EXISTS players_name")
+            db.execute("DROP INDEX IF EXISTS hands_tournament")
+            self._insert_hands(0)
+        db.executescript(_INDEXES)
+
+    def update(self):
+        """
+        Index the hands appended to the archive since the last scan. The scan starts again from the last indexed hand,
+        it may have been incomplete. The whole archive is scanned when that hand is not there anymore
+        """
+        db = self._db
+        last_hand = db.execute("SELECT offset FROM hands ORDER BY offset DESC LIMIT 1").fetchone()
+        start = last_hand[0] if last_hand is not None else 0
+        if self._mmap[start:start + len(_HEADER)] != _HEADER and last_hand is not None:  # replaced by another file
+            self.build()
+            return
+        with db:
+            db.execute("DELETE FROM players WHERE hand_id IN (SELECT hand_id FROM hands WHERE offset >= ?)", (start,))
+            db.execute("DELETE FROM hands WHERE offset >= ?", (start,))
+            self._insert_hands(start)
+
+    def _insert_hands(self, start):
+        db = self._db
+        for hand_id, tournament_id, table_name, max_seat, offset, length, names in scan_hands(self._mmap, start):
+            db.execute("INSERT OR REPLACE INTO hands VALUES (?, ?, ?, ?, ?, ?)",
+                       (hand_id, tournament_id, table_name, max_seat, offset, length))
+            db.executemany("INSERT INTO players VALUES (?, ?)", [(hand_id, name) for name in names])
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('size', ?)", (len(self._mmap),))
+
+    def close(self):
+        if not isinstance(self._mmap, bytes):
+            self._mmap.close()
+        self._file.close()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM hands").fetchone()[0]
+
+    ###########
+    # Lookups #
+    ###########
+
+    def hand_ids(self, player=None, tournament_id=None, table_name=None):
+        """
+        Return the hand IDs matching all the given criteria, in file order
+        """
+        query = "SELECT hands.hand_id FROM hands"
+        conditions = []
+        params = []
+        if player is not None:
+            query += " JOIN players ON players.hand_id = hands.hand_id"
+            conditions.append("players.name = ?")
+            params.append(player)
+        if tournament_id is not None:
+            conditions.append("hands.tournament_id = ?")
+            params.append(tournament_id)
+        if table_name is not None:
+            conditions.append("hands.table_name = ?")
+            params.append(table_name)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY hands.offset"
+        return [row[0] for row in self._db.execute(query, params)]
+
+    def get_text(self, hand_id):
+        """
+        Return the text of a hand, KeyError if the hand is not in the archive
+        """
+        row = self._db.execute("SELECT offset, length FROM hands WHERE hand_id = ?", (hand_id,)).fetchone()
+        if row is None:
+            raise KeyError(hand_id)
+        offset, length = row
+        data = self._mmap[offset:offset + length]
+        return data if isinstance(data, str) else _decode(data)  # str on python 2
+
+    def get(self, hand_id):
+        """
+        Parse and return one hand
+        """
+        return self.parser(self.get_text(hand_id))
+
+    def hands_of_player(self, player):
+        """
+        Generator parsing the hands of a player, in file order
+        """
+        for hand_id in self.hand_ids(player=player):
+            yield self.get(hand_id)
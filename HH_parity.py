@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Parity check of the pure python betting engine (firepoker.Betting.Hand) against the firepoker extension
+(firepoker.Hand.Hand): the sequence of each hand is replayed with both, and the acting player, the round, its
+investment and the pot are compared after every action.
+
+python HH_parity.py hands_example.txt hands_sauv.txt
+
+A hand mismatches when an action differs, when the replays do not have the same number of actions, or when they do
+not fail with the same exception. Hands PS2acpc can not parse are skipped.
+"""
+
+from __future__ import print_function
+
+import sys
+import argparse
+
+from HH_tools import iter_hands, PS2acpc, replay_sequence
+from HH_batch import list_files
+from firepoker import Betting, Hand
+
+
+def _replay(acpc, hand_class):
+    """
+    :return: list of (position, round, investment, pot) after each action, or the name of the exception raised
+    """
+    ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+    try:
+        replayed, final_pot = replay_sequence(stacks, sequence, bblind, hand_class)
+    except Exception as e:
+        return type(e).__name__
+    return [(action.position, action.round, action.investment, action.pot) for action in replayed]
+
+
+def compare_engines(acpc):
+    """
+    :param acpc: PS2acpc tuple
+    :return: None when both engines give the same replay, else (python replay, extension replay)
+    """
+    python_replay = _replay(acpc, Betting.Hand)
+    extension_replay = _replay(acpc, Hand.Hand)
+    if python_replay == extension_replay:
+        return None
+    return python_replay, extension_replay
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('paths', nargs='+', help="history files or directories")
+    parser.add_argument('--pattern', default='*.txt', help="file name pattern used in directories")
+    args = parser.parse_args(argv)
+
+    hands = skipped = mismatched = 0
+    for path in list_files(args.paths, args.pattern):
+        for index, hand in enumerate(iter_hands(path)):
+            try:
+                acpc = PS2acpc(hand)
+            except Exception:
+                skipped += 1
+                continue
+            hands += 1
+            mismatch = compare_engines(acpc)
+            if mismatch is not None:
+                mismatched += 1
+                print('{} #{} {}'.format(path, index, acpc[3]))
+                print('  python    {}'.format(mismatch[0]))
+                print('  extension {}'.format(mismatch[1]))
+    print('{} hands, {} mismatched, {} not parsed'.format(hands, mismatched, skipped), file=sys.stderr)
+    return 0 if mismatched == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
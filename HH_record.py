@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Compact record of a parsed hand, for keeping millions of hands in memory.
+
+positions, cards and chips are the ints of HH_codec: positions are indexes in the HandHistory.pos_name_lst sublist
+of the hand (0: BTN, 1: SB or BB, ..), cards are ints from 0 to 51, the same as firepoker.Hand.Card2Str
+(value * 4 + suit), -1 when unknown, chips are ints in cents
+"""
+
+from array import array
+
+try:
+    from sys import intern  # python 3, intern is a builtin in python 2
+except ImportError:
+    pass
+
+from HH_codec import CARDS, POSITION_INDEX, cards2ints, to_cents
+from HH_tools import HandHistory, FastHandHistory
+
+_pos_name_lst = HandHistory.pos_name_lst
+
+
+class ParsedHand(object):
+    """
+    The PS2acpc tuple, without dicts: stacks, holecards and players are ordered by position index,
+    player names are interned since the same players come back on many hands.
+    """
+    __slots__ = ('ante', 'bblind', 'stacks', 'sequence', 'holecards', 'boardcards', 'winner', 'players', 'uncalled')
+
+    def __init__(self, ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled):
+        self.ante = ante  # cents
+        self.bblind = bblind  # cents
+        self.stacks = stacks  # array of cents, by position index
+        self.sequence = sequence
+        self.holecards = holecards  # array of 2 cards by position index, -1 if not shown
+        self.boardcards = boardcards  # array of 0 to 5 cards
+        self.winner = winner  # player name, as found in the summary
+        self.players = players  # tuple of player names, by position index
+        self.uncalled = uncalled  # cents
+
+    @property
+    def positions(self):
+        """
+        Position names of the hand, index i is the name of the position i
+        """
+        return _pos_name_lst[len(self.players) - 2]
+
+    @classmethod
+    def from_acpc(cls, acpc):
+        """
+        Build the record from the tuple returned by PS2acpc
+        """
+        ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+        positions = _pos_name_lst[len(players) - 2]
+        position_index = POSITION_INDEX[len(players) - 2]
+
+        stacks_arr = array('l', [0] * len(positions))
+        for pos, stack in stacks.items():
+            stacks_arr[position_index[pos]] = to_cents(stack)
+
+        holecards_arr = array('b', [-1] * (2 * len(positions)))
+        for pos, cards in holecards.items():
+            index = 2 * position_index[pos]
+            holecards_arr[index:index + 2] = array('b', cards2ints(cards))
+
+        return cls(to_cents(ante), to_cents(bblind), stacks_arr, sequence, holecards_arr,
+                   array('b', cards2ints(boardcards.replace('/', ''))), intern(str(winner)),
+                   tuple(intern(str(players[pos])) for pos in positions), to_cents(uncalled))
+
+    @classmethod
+    def from_history(cls, hand_history):
+        """
+        Build the record from a parsed HandHistory (or FastHandHistory)
+        """
+        return cls.from_acpc((hand_history.ante, hand_history.bblind, hand_history.stacks, hand_history.sequence,
+                              hand_history.holecards, hand_history.boardcards, hand_history.winner,
+                              hand_history.players, hand_history.uncalledbet))
+
+    @classmethod
+    def from_text(cls, ps_text):
+        """
+        Parse a PokerStars hand, only the record is kept
+        """
+        return cls.from_history(FastHandHistory(ps_text))
+
+    def to_acpc(self):
+        """
+        Return the same tuple as PS2acpc
+        """
+        positions = self.positions
+        stacks = {}
+        holecards = {}
+        players = {}
+        for i, pos in enumerate(positions):
+            stacks[pos] = self.stacks[i] / 100.0
+            players[pos] = self.players[i]
+            if self.holecards[2 * i] != -1:
+                holecards[pos] = CARDS[self.holecards[2 * i]] + CARDS[self.holecards[2 * i + 1]]
+
+        boardcards = ''
+        for i, card in enumerate(self.boardcards):
+            boardcards += '/' + CARDS[card] if i == 3 or i == 4 else CARDS[card]
+
+        # the parser keeps the ante as the matched string of digits, and bblind as an int
+        ante = str(self.ante // 100) if self.ante else 0
+        uncalled = self.uncalled / 100.0 if self.uncalled else 0
+        return (ante, self.bblind // 100, stacks, self.sequence, holecards, boardcards,
+                self.winner, players, uncalled)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Per player statistics, accumulated in one pass over the hands.
+
+stats = PlayerStats()
+for hand in iter_hands('archive.txt'):
+    stats.add(PS2acpc(hand))
+print(stats.report('DawiC'))  # {'hands': .., 'vpip': .., 'pfr': .., 'three_bet': .., ..}
+
+Each player has one array of counters (see COUNTERS), PlayerStats objects of different shards are added together
+with merge(), stats_of_files() does it over a process pool, one shard per file.
+The actions come from replay_sequence, hands whose sequence can not be replayed are counted in errors and skipped.
+"""
+
+import multiprocessing
+from array import array
+
+from HH_tools import HandHistory, iter_hands, PS2acpc, replay_sequence
+from HH_codec import to_cents
+from HH_batch import list_files
+
+_pos_name_lst = HandHistory.pos_name_lst
+
+COUNTERS = [
+    'hands',
+    'vpip',  # put money in the pot preflop, the blinds do not count
+    'pfr',  # raised preflop
+    'three_bet_opportunities',  # acted preflop facing exactly one raise
+    'three_bets',
+    'cbets_faced',  # acted on the flop after a bet of the preflop raiser, first bet of the flop
+    'folds_to_cbet',
+    'saw_flop',
+    'went_to_showdown',  # saw the flop and was still in at the end, with another player
+    'won_at_showdown',
+    'net_cents',  # chips won minus chips put in the pot, antes included, in cents
+]
+(HANDS, VPIP, PFR, THREE_BET_OPPORTUNITIES, THREE_BETS, CBETS_FACED, FOLDS_TO_CBET, SAW_FLOP, WENT_TO_SHOWDOWN,
+ WON_AT_SHOWDOWN, NET_CENTS) = range(len(COUNTERS))
+
+
+def _ratio(numerator, denominator):
+    return numerator / float(denominator) if denominator else None
+
+
+class PlayerStats:
+    """
+    Counters of every player seen, by player name
+    """
+
+    def __init__(self):
+        self.players = {}  # name: array of counters, in the COUNTERS order
+        self.hands = 0
+        self.errors = 0  # hands skipped
+
+    def __len__(self):
+        return len(self.players)
+
+    def _counters(self, name):
+        counters = self.players.get(name)
+        if counters is None:
+            counters = self.players[name] = array('l', [0] * len(COUNTERS))
+        return counters
+
+    def add(self, acpc):
+        """
+        Count one hand
+        :param acpc: PS2acpc tuple
+        """
+        ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+        try:
+            replayed, final_pot = replay_sequence(stacks, sequence, bblind)
+        except Exception:
+            self.errors += 1
+            return
+        self.hands += 1
+        positions = _pos_name_lst[len(stacks) - 2]
+
+        vpip = set()
+        pfr = set()
+        three_bet_opportunities = set()
+        three_bets = set()
+        cbets_faced = set()
+        folds_to_cbet = set()
+        folded = set()
+        folded_preflop = set()
+        invested = {}
+
+        preflop_raises = 0
+        preflop_raiser = None
+        flop_raises = 0
+        cbet = False
+        for action in replayed:
+            pos = action.position
+            invested[pos] = action.investment
+            if action.action == 'f':
+                folded.add(pos)
+
+            if action.round == 0:
+                if action.action == 'f':
+                    folded_preflop.add(pos)
+                if preflop_raises == 1:
+                    three_bet_opportunities.add(pos)
+                if action.action == 'r':
+                    if preflop_raises == 1:
+                        three_bets.add(pos)
+                    preflop_raises += 1
+                    preflop_raiser = pos
+                    vpip.add(pos)
+                    pfr.add(pos)
+                elif action.action == 'c' and action.max_before > action.investment_before:
+                    vpip.add(pos)
+
+            elif action.round == 1:
+                if cbet and flop_raises == 1 and pos != preflop_raiser and pos not in cbets_faced:
+                    cbets_faced.add(pos)
+                    if action.action == 'f':
+                        folds_to_cbet.add(pos)
+                if action.action == 'r':
+                    if flop_raises == 0 and pos == preflop_raiser:
+                        cbet = True
+                    flop_raises += 1
+
+        # the big blind does not act on a walk, its blind is the rest of the pot
+        not_acted = [pos for pos in positions if pos not in invested]
+        if len(not_acted) == 1:
+            invested[not_acted[0]] = final_pot - sum(invested.values())
+
+        ante_cents = to_cents(ante)
+        saw_flop = boardcards != ""
+        still_in = [pos for pos in positions if pos not in folded]
+        showdown = len(still_in) >= 2
+
+        for pos in positions:
+            name = players[pos]
+            counters = self._counters(name)
+            counters[HANDS] += 1
+            counters[VPIP] += pos in vpip
+            counters[PFR] += pos in pfr
+            counters[THREE_BET_OPPORTUNITIES] += pos in three_bet_opportunities
+            counters[THREE_BETS] += pos in three_bets
+            counters[CBETS_FACED] += pos in cbets_faced
+            counters[FOLDS_TO_CBET] += pos in folds_to_cbet
+            if saw_flop and pos not in folded_preflop:
+                counters[SAW_FLOP] += 1
+                if showdown and pos in still_in:
+                    counters[WENT_TO_SHOWDOWN] += 1
+                    counters[WON_AT_SHOWDOWN] += name == winner
+            counters[NET_CENTS] -= invested.get(pos, 0) + ante_cents
+            if name == winner:
+                counters[NET_CENTS] += final_pot + ante_cents * len(positions)
+
+    def add_history(self, hand_history):
+        """
+        Count a parsed HandHistory (or FastHandHistory)
+        """
+        self.add((hand_history.ante, hand_history.bblind, hand_history.stacks, hand_history.sequence,
+                  hand_history.holecards, hand_history.boardcards, hand_history.winner, hand_history.players,
+                  hand_history.uncalledbet))
+
+    def merge(self, other):
+        """
+        Add the counters of another PlayerStats, eg from another shard
+        """
+        self.hands += other.hands
+        self.errors += other.errors
+        for name, other_counters in other.players.items():
+            counters = self._counters(name)
+            for i, value in enumerate(other_counters):
+                counters[i] += value
+
+    def counters(self, name):
+        """
+        Return the raw counters of a player as a dict, KeyError if the player was never seen
+        """
+        return dict(zip(COUNTERS, self.players[name]))
+
+    def report(self, name):
+        """
+        Return the counters of a player and the usual ratios (None when there was no opportunity)
+        """
+        c = self.players[name]
+        report = self.counters(name)
+        report.update({
+            'vpip_rate': _ratio(c[VPIP], c[HANDS]),
+            'pfr_rate': _ratio(c[PFR], c[HANDS]),
+            'three_bet_rate': _ratio(c[THREE_BETS], c[THREE_BET_OPPORTUNITIES]),
+            'fold_to_cbet_rate': _ratio(c[FOLDS_TO_CBET], c[CBETS_FACED]),
+            'wtsd_rate': _ratio(c[WENT_TO_SHOWDOWN], c[SAW_FLOP]),
+            'won_at_showdown_rate': _ratio(c[WON_AT_SHOWDOWN], c[WENT_TO_SHOWDOWN]),
+            'net': c[NET_CENTS] / 100.0,
+        })
+        return report
+
+
+def stats_of_file(path):
+    """
+    PlayerStats of one history file, hands that can not be parsed are counted in errors
+    """
+    stats = PlayerStats()
+    for hand in iter_hands(path):
+        try:
+            acpc = PS2acpc(hand)
+        except Exception:
+            stats.errors += 1
+            continue
+        stats.add(acpc)
+    return stats
+
+
+def stats_of_files(paths, workers=None, pattern='*.txt'):
+    """
+    PlayerStats of all the hands of the given files and directories, each file is a shard
+    :param workers: number of processes, None for the number of cpus. 1 computes in the current process
+    """
+    files = list_files(paths, pattern)
+    stats = PlayerStats()
+    if workers == 1:
+        for path in files:
+            stats.merge(stats_of_file(path))
+        return stats
+
+    pool = multiprocessing.Pool(workers or multiprocessing.cpu_count())
+    try:
+        for shard in pool.imap_unordered(stats_of_file, files):
+            stats.merge(shard)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return stats
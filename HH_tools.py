@@ -24,28 +24,120 @@ http://www.handconverter.com/
 """
 
 
+import io
 import re
-import firepoker.Hand as Hand
-from collections import deque  # for list rotation
+import bisect
+import functools
+import timeit
+import firepoker.Betting as Betting
+from HH_codec import POSITION_NAMES, ACTION_CHARS, STREET, RAISE, to_cents, cents2str, parse_sequence
+from collections import namedtuple
+from contextlib import contextmanager
 # _pos_name_lst is declared after. Located inside the class
 
+# compiled once, shared by HandHistory and FastHandHistory
+_RE_PART = re.compile('\*\*\* ([A-Z- ]+) \*\*\*')
+_RE_BLINDS = re.compile("\(\$?([0-9-.]+)/\$?([0-9-.]+)( USD)?\)")
+_RE_BTN_SEAT = re.compile('Seat #([0-9]+)')
+_RE_MAX_SEAT = re.compile('([0-9]+)-max')  # maximum number of seat (?-max)
+_RE_SEAT = re.compile('Seat ([0-9]+): (.+) \(\$?([0-9-.]+)')
+_RE_SEAT_LINES = re.compile('(?:Seat[^\n]*\n)*')  # block of seat lines, ended by a newline
+_RE_SEAT_LINE = re.compile('Seat ([0-9]+): (.+) \(\$?([0-9-.]+)[^\n]*\n')  # _RE_SEAT up to the end of its line
+_RE_ANTE = re.compile('the ante ([0-9]+)')
+_RE_UNCALLED = re.compile('Uncalled bet \(([0-9-.]+)\)')
+_RE_RAISE_TO = re.compile('to \$?([0-9-.]+)')
+_RE_BET = re.compile(' \$?([0-9-.]+)')
+_RE_DEALT = re.compile("Dealt to (.+) \[(.+)\]")  # group1 name, 2 card value
+_RE_SHOWS = re.compile("(.+): shows \[(.+)\]")
+_RE_BOARD = re.compile("\[(.+)\]")
+_RE_WINNER = re.compile('Seat [0-9]+: (\w+) ')
+
+
+###################
+# Stage profiling #
+###################
+
+_timer = timeit.default_timer
+_profiler = None  # set by profiling(), stages are not timed when None
+
+
+class StageProfiler:
+    """
+    Aggregate wall time and call counts by stage, over all the hands parsed or written while installed
+    with profiling(). Any object with a record(stage, seconds) method can be used instead.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+
+    def record(self, stage, seconds):
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def merge(self, other):
+        """
+        Add the numbers of another StageProfiler, eg from another process
+        """
+        for stage in other.calls:
+            self.calls[stage] = self.calls.get(stage, 0) + other.calls[stage]
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + other.seconds[stage]
+
+    def report(self):
+        """
+        Return a dict stage: {'calls', 'seconds', 'mean_us'}
+        """
+        return dict((stage, {'calls': self.calls[stage],
+                             'seconds': self.seconds[stage],
+                             'mean_us': self.seconds[stage] / self.calls[stage] * 1e6})
+                    for stage in self.calls)
+
+
+@contextmanager
+def profiling(profiler=None):
+    """
+    Time the parser and writer stages while in the with block:
+
+    with profiling() as profiler:
+        for hand in iter_hands(path):
+            PS2acpc(hand)
+    print(profiler.report())
+    """
+    global _profiler
+    previous = _profiler
+    _profiler = profiler if profiler is not None else StageProfiler()
+    try:
+        yield _profiler
+    finally:
+        _profiler = previous
+
+
+def _stage(name):
+    """
+    Decorator recording the time of each call under name, when a profiler is installed
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = _timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, _timer() - start)
+        return wrapper
+    return decorator
+
 
 class HandHistory:
     """
     Class called for each hand
     """
-    pos_name_lst = [
-            ["BTN", "BB"],
-            ["BTN", "SB", "BB"],
-            ["BTN", "SB", "BB", "CO"],
-            ["BTN", "SB", "BB", "UTG", "CO"],
-            ["BTN", "SB", "BB", "UTG", "MP1", "CO"],
-            ["BTN", "SB", "BB", "UTG", "MP1", "MP2", "CO"],
-            ["BTN", "SB", "BB", "UTG", "MP1", "MP2", "MP3", "CO"],
-            ["BTN", "SB", "BB", "UTG", "UTG+1", "MP1", "MP2", "MP3", "CO"],
-            ["BTN", "SB", "BB", "UTG", "UTG+1", "UTG+2", "MP1", "MP2", "MP3", "CO"],
-        ]
+    pos_name_lst = POSITION_NAMES
 
+    @_stage('HandHistory')
     def __init__(self, hand_file):
         # format attributes
         self.ante = 0
@@ -64,6 +156,7 @@ class HandHistory:
         self.btn_seat = 0
         self.part_dict = {}
         self.player_list = []
+        self.seat_list = []  # seat numbers of player_list
         self.player_inv_dict = {}  # for given name, gives the position
 
 
@@ -73,13 +166,18 @@ class HandHistory:
         self.parse_sequence()
         self.parse_summary()
 
+        # the raw text and its parts are not needed anymore once parsed
+        self.hand_file = None
+        self.part_dict = None
+
+    @_stage('part_parse')
     def part_parse(self):
         """
         Return a dict of the different division of the hand history
         Not all hands have the name number of parts, it return a dict with the part name as key and content as value
         """
         parts = []
-        for part in re.split('\*\*\* ([A-Z- ]+) \*\*\*', self.hand_file):  # return [ 'part1', 'splitter1', 'part2',..
+        for part in _RE_PART.split(self.hand_file):  # return [ 'part1', 'splitter1', 'part2',..
             parts.append(part)
 
         for i in range(0, len(parts)):
@@ -89,6 +187,7 @@ class HandHistory:
                 # print(type(parts[i]))
                 self.part_dict[parts[i]] = parts[i+1].split('\n')
 
+    @_stage('parse_hand')
     def parse_hand(self):
         gen_line = (yield_line for yield_line in self.hand_file.split('\n'))  # splits current hand into lines
 
@@ -99,12 +198,12 @@ class HandHistory:
         for line in gen_line:
             if line[0:5] == "Poker":
                 # print("header",  line)
-                reg_blind = re.search("\(\$?([0-9-.]+)/\$?([0-9-.]+)( USD)?\)", line)
+                reg_blind = _RE_BLINDS.search(line)
                 self.bblind = int(reg_blind.group(2))  # just the big blind, sb == bb/2
             if line[0:5] == "Table":  # retrieve max number of sets and btn position
 
-                self.btn_seat = int(re.search('#(.)', line).group(1))
-                self.max_seat = int(re.search('(.)-max', line).group(1))  # regex for finding the maximum number of seat (?-max)
+                self.btn_seat = int(_RE_BTN_SEAT.search(line).group(1))
+                self.max_seat = int(_RE_MAX_SEAT.search(line).group(1))  # regex for finding the maximum number of seat (?-max)
 
                 break
 
@@ -115,16 +214,13 @@ class HandHistory:
         for line in gen_line:  # fill player dictonary and stacks dictionnary
             if line[0:4] != "Seat":
                 break
-            reg_player = re.search('(.): (.+) \(\$?([0-9-.]+)', line)
+            reg_player = _RE_SEAT.search(line)
             player_num_seat = int(reg_player.group(1))
             player_name = reg_player.group(2)
             player_stacks = float(reg_player.group(3))
 
             self.player_list.append(player_name)
-
-            # define BTN player
-            if player_num_seat == self.btn_seat:
-                self.players["BTN"] = player_name
+            self.seat_list.append(player_num_seat)
 
             # temporary stacks dict
             stacks_temp[player_name] = player_stacks
@@ -141,26 +237,27 @@ class HandHistory:
 
         for line in gen_line:
             try:
-                self.ante = re.search('the ante ([0-9]+)', line).group(1)
+                self.ante = _RE_ANTE.search(line).group(1)
             except AttributeError:  # if the line does not exist
                 pass
             try:  # quick, ugly fix for uncalled bet
-                self.uncalledbet = float(re.search('Uncalled bet \(([0-9-.]+)\)', line).group(1))
+                self.uncalledbet = float(_RE_UNCALLED.search(line).group(1))
             except AttributeError:  # if the line does not exist
                 pass
 
+    @_stage('parse_sequence')
     def parse_sequence(self):
         """
         Get sequence, and hole cards.
         :return:
         """
-        def craft_seq(line_, previous_amount):
+        def craft_seq(line_, previous_amount):  # amounts in cents
             if "raises" in line_:
-                raised = float(re.search('to \$?([0-9-.]+)', line_).group(1))
-                return "r"+"{0:.2f}".format(raised+previous_amount), raised
+                raised = to_cents(_RE_RAISE_TO.search(line_).group(1))
+                return "r" + cents2str(raised + previous_amount), raised
             if "bets" in line_:
-                bet = float(re.search(' \$?([0-9-.]+)', line_).group(1))
-                return "r"+"{0:.2f}".format(bet+previous_amount), bet
+                bet = to_cents(_RE_BET.search(line_).group(1))
+                return "r" + cents2str(bet + previous_amount), bet
             if "folds" in line_:
                 return "f", 0
             if "calls" in line_ or "check" in line_:
@@ -170,7 +267,7 @@ class HandHistory:
 
         # add player hole cards
         try:
-            reg_holecard = re.search("Dealt to (.+) \[(.+)\]", self.part_dict["HOLE CARDS"][1])  # group1 name, 2 card value
+            reg_holecard = _RE_DEALT.search(self.part_dict["HOLE CARDS"][1])  # group1 name, 2 card value
             self.holecards[self.player_inv_dict[reg_holecard.group(1)]] = reg_holecard.group(2).replace(' ', '')
         except AttributeError:  # if line not found
             pass
@@ -209,11 +306,12 @@ class HandHistory:
         if self.part_dict.get("SHOW DOWN", None) is not None:
             for line in self.part_dict["SHOW DOWN"]:
                 try:
-                    reg_show = re.search("(.+): shows \[(.+)\]", line)
+                    reg_show = _RE_SHOWS.search(line)
                     self.holecards[self.player_inv_dict[reg_show.group(1)]] = reg_show.group(2).replace(' ', '')
                 except AttributeError:  # if regex line not found
                     pass
 
+    @_stage('parse_summary')
     def parse_summary(self):
         """
         Get bordcards and winner name
@@ -222,7 +320,7 @@ class HandHistory:
         for line in self.part_dict["SUMMARY"]:
 
             if line[0:5] == "Board":
-                reg_boardcards = re.search("\[(.+)\]", line).group(1).split(' ')  # board element into list
+                reg_boardcards = _RE_BOARD.search(line).group(1).split(' ')  # board element into list
 
                 for i, item in enumerate(reg_boardcards):  # split the list with '/', function of flop/turn/river
                     if i == 3 or i == 4:  # assuming there is a max of 3 flop
@@ -231,52 +329,419 @@ class HandHistory:
                         self.boardcards += item
 
             if "and won" in line or "collected" in line:  # fixme sometime things between player and showed, get other win cases
-                self.winner = re.search('Seat [0-9]: (\w+) ', line).group(1)  # assuming there is always "showed" when "won"
+                self.winner = _RE_WINNER.search(line).group(1)  # assuming there is always "showed" when "won"
                 # print("Winner: ", self.winner)
 
+    @_stage('position')
     def position(self):
         """
-        Uses self.player_list, and player btn already defined in self.players
-        BB blind always the last ?
+        Uses self.player_list, self.seat_list and self.btn_seat, fills self.players and the reverse dict
+        """
+        players = self.players
+        for player, pos in zip(self.player_list, seat_positions(self.seat_list, self.btn_seat)):
+            players[pos] = player
 
-        from itertools import cycle
-        cycle(laliste)
+        # Build a reverse dict
+        for pos, player in players.items():
+            self.player_inv_dict[player] = pos
 
-        list of list with position name; if player list match the same len, select the sublist
 
-        :return:
+def _make_seat_positions():
+    table = {}
+    for sublist in HandHistory.pos_name_lst:
+        n_players = len(sublist)
+        for btn_index in range(n_players):
+            table[(n_players, btn_index)] = tuple(sublist[(i - btn_index) % n_players] for i in range(n_players))
+    return table
+
+
+# (number of players, index of the button in the sorted seats): position name of each seat, in seat order
+_SEAT_POSITIONS = _make_seat_positions()
+
+
+def seat_positions(seats, btn_seat):
+    """
+    Position names of the players, from their seat numbers. Seats do not have to be contiguous
+    :param seats: seat numbers of the players, in the order of the hand (sorted)
+    :param btn_seat: seat of the button. When nobody sits there (dead button), the player before has the button
+    :return: tuple of position names, in the order of seats
+    """
+    sorted_seats = sorted(seats)
+    btn_index = bisect.bisect_right(sorted_seats, btn_seat) - 1  # -1 (button before the first seat) is the last
+    positions = _SEAT_POSITIONS[(len(seats), btn_index % len(seats))]
+    if sorted_seats == seats:
+        return positions
+    position_of_seat = dict(zip(sorted_seats, positions))
+    return tuple(position_of_seat[seat] for seat in seats)
+
+
+_STREETS = {"HOLE CARDS": 0, "FLOP": 1, "TURN": 2, "RIVER": 3}
+
+
+class FastHandHistory(HandHistory):
+    """
+    Single pass version of HandHistory, same attributes and same results.
+    The text is split once on the part lines ('*** <PART> ***'), then each part is read by a loop of its own
+    with plain string tests. The seats are read with a single regex, the other regex are only run on the lines
+    carrying a value (raises and bets, uncalled bet, shows, board, winner), and the uncalled bet and ante
+    lines are only looked for in the parts that contain one.
+    The raw text and the part dict are not kept.
+    While profiling, the parts are timed under the parse_hand, position, parse_sequence and parse_summary stages
+    of HandHistory, there is no part_parse stage.
+    """
+
+    @_stage('FastHandHistory')
+    def __init__(self, hand_file):
+        # format attributes
+        self.ante = 0
+        self.bblind = 0
+        self.stacks = {}
+        self.sequence = ""
+        self.holecards = {}
+        self.boardcards = ""
+        self.winner = ""
+        self.players = {}
+        self.uncalledbet = 0
+
+        # utility attributes
+        self.max_seat = 0
+        self.btn_seat = 0
+        self.player_list = []
+        self.seat_list = []
+        self.player_inv_dict = {}
+
+        # parsing state
+        self._stacks_temp = {}
+        self._street_seqs = ["", "", "", ""]
+        self._street_sums = [0, 0, 0, 0]  # raise/bet amounts of each street in cents, see parse_sequence
+        self._prev_amount = 0
+        self._turn_amount = 0  # parse_sequence sums the turn running amount on each line
+
+        self._parse(hand_file)
+
+    def _parse(self, hand_file):
+        """
+        Read the head of the hand then its parts, in the order of the text
+        """
+        profiler = _profiler
+        if profiler is not None:
+            seconds = {}
+            start = _timer()
+
+        pieces = self._read_head(hand_file)
+        if profiler is not None:
+            now = _timer()
+            seconds['parse_hand'] = now - start
+            start = now
+
+        part = None  # lines before the first part line are posts lines
+        street = None
+        first_hole = False
+        parts_seen = set()
+        for piece in pieces:
+            lines = piece.split('\n')
+            part_end = lines[0].find(' ***')
+            if part_end != -1:  # otherwise not a part line, ignored, the current part goes on
+                part = lines[0][:part_end]
+                parts_seen.add(part)
+                if street == 2:  # trailing line of the turn part
+                    self._turn_amount += self._street_sums[2]
+
+                street = _STREETS.get(part)
+                # same previous amounts as parse_sequence: preflop sum for the flop, flop sum for the turn,
+                # and the accumulated turn amount for the river
+                if street == 1:
+                    self._prev_amount = self._street_sums[0]
+                elif street == 2:
+                    self._prev_amount = self._street_sums[1]
+                elif street == 3:
+                    self._prev_amount = self._turn_amount
+                first_hole = street == 0
+            del lines[0]
+            if not lines:
+                continue
+
+            uncalled = '\nUnca' in piece
+            if street is not None:
+                if first_hole:
+                    if lines[0][0:4] == 'Deal':
+                        self._read_dealt(lines[0])
+                    first_hole = False
+                self._read_street(lines, street, uncalled)
+            elif part == "SUMMARY":
+                self._read_summary(lines, uncalled)
+            elif part == "SHOW DOWN":
+                self._read_show_down(lines, uncalled)
+            elif part is None:
+                self._read_posts(lines, uncalled, 'the ante' in piece)
+            elif uncalled:
+                self._read_posts(lines, uncalled, False)  # only the posts have an ante
+
+            if profiler is not None:
+                now = _timer()
+                stage = _PART_STAGES.get(part, 'parse_sequence')
+                seconds[stage] = seconds.get(stage, 0.0) + now - start
+                start = now
+
+        if profiler is not None:
+            for stage in seconds:
+                profiler.record(stage, seconds[stage])
+
+        if 'SUMMARY' not in parts_seen:
+            raise KeyError("SUMMARY")
+        if 'HOLE CARDS' not in parts_seen:  # same error as HandHistory.parse_sequence
+            raise KeyError("HOLE CARDS")
+        self.sequence = '/'.join(self._street_seqs)
+
+    ########
+    # Head #
+    ########
+
+    def _read_head(self, hand_file):
+        """
+        Header, table and seats lines
+        :return: the rest of the text split on the part lines, the first piece has the posts lines
+        """
+        if hand_file[0:4] == 'Tabl':
+            table_start = 0
+        else:
+            table_start = hand_file.find('\nTabl') + 1
+            if table_start == 0:  # no table line, every line is a header line
+                self._read_header(hand_file.split('\n'))
+                return []
+        self._read_header(hand_file[:table_start].split('\n'))
+
+        # table line, string search instead of the 'Seat #([0-9]+)' and '([0-9]+)-max' regex
+        line_end = hand_file.find('\n', table_start)
+        if line_end == -1:
+            line_end = len(hand_file)
+        line = hand_file[table_start:line_end]
+        btn_start = line.index('Seat #') + 6
+        self.btn_seat = int(line[btn_start:line.index(' ', btn_start)])
+        max_end = line.index('-max')
+        self.max_seat = int(line[line.rindex(' ', 0, max_end) + 1:max_end])
+
+        # seat lines: a single findall when each line has its seat, line by line otherwise (and for the last line)
+        start = line_end + 1
+        seats_end = _RE_SEAT_LINES.match(hand_file, start).end()
+        seats = _RE_SEAT_LINE.findall(hand_file, start, seats_end)
+        if seats and len(seats) == hand_file.count('\n', start, seats_end):
+            seat_numbers, player_names, player_stacks = zip(*seats)
+            self.player_list = list(player_names)
+            self.seat_list = list(map(int, seat_numbers))
+            self._stacks_temp = dict(zip(player_names, map(float, player_stacks)))
+            start = seats_end
+        while True:
+            while hand_file.startswith('Seat', start):
+                line_end = hand_file.find('\n', start)
+                if line_end == -1:
+                    line_end = len(hand_file)
+                reg_player = _RE_SEAT.search(hand_file, start, line_end)
+                player_name = reg_player.group(2)
+                self.player_list.append(player_name)
+                self.seat_list.append(int(reg_player.group(1)))
+                self._stacks_temp[player_name] = float(reg_player.group(3))
+                start = line_end + 1
+            if start > len(hand_file):  # the hand ends on the seats
+                return []
+
+            # first line after the seats, like HandHistory.parse_hand it is not checked for ante or uncalled bet
+            self._set_positions()
+            line_end = hand_file.find('\n', start)
+            if line_end == -1:
+                line_end = len(hand_file)
+            if hand_file.startswith('*** ', start):
+                if hand_file.find(' ***', start + 4, line_end) != -1:
+                    break
+                start = line_end + 1  # not a part line, still in the seats
+            else:
+                start = line_end + 1
+                break
+
+        return ('\n' + hand_file[start:]).split('\n*** ')
+
+    def _read_header(self, lines):
+        for line in lines:
+            if line[0:5] == "Poker":
+                self.bblind = int(_RE_BLINDS.search(line).group(2))
+
+    @_stage('position')
+    def _set_positions(self):
+        # same as HandHistory.position
+        self.players = players = dict(zip(seat_positions(self.seat_list, self.btn_seat), self.player_list))
+        self.player_inv_dict = player_inv_dict = dict(zip(players.values(), players))
+        self.stacks = dict(zip([player_inv_dict[player_name] for player_name in self._stacks_temp],
+                               self._stacks_temp.values()))
+        del self._stacks_temp
+
+    def _read_posts(self, lines, uncalled, ante):
+        if not uncalled and not ante:
+            return
+        for line in lines:
+            if line[0:4] == 'Unca':
+                self._read_uncalled(line)
+            elif ante and 'the ante' in line:
+                self.ante = _RE_ANTE.search(line).group(1)
+
+    def _read_uncalled(self, line):
+        reg_uncalled = _RE_UNCALLED.search(line)
+        if reg_uncalled is not None:
+            self.uncalledbet = float(reg_uncalled.group(1))
+
+    ##########
+    # Street #
+    ##########
+
+    def _read_street(self, lines, street, uncalled):
+        """
+        Same as craft_seq in HandHistory.parse_sequence
+        """
+        seq = self._street_seqs[street]
+        amount = self._street_sums[street]
+        prev_amount = self._prev_amount
+        turn_amount = self._turn_amount
+        is_turn = street == 2
+        for line in lines:
+            if uncalled and line[0:4] == 'Unca':
+                self._read_uncalled(line)
+            if "raises" in line:
+                raised = to_cents(_RE_RAISE_TO.search(line).group(1))
+                seq += "r" + cents2str(raised + prev_amount)
+                amount += raised
+            elif "bets" in line:
+                bet = to_cents(_RE_BET.search(line).group(1))
+                seq += "r" + cents2str(bet + prev_amount)
+                amount += bet
+            elif "folds" in line:
+                seq += "f"
+            elif "calls" in line or "check" in line:
+                seq += "c"
+            if is_turn:
+                turn_amount += amount
+        self._street_seqs[street] = seq
+        self._street_sums[street] = amount
+        self._turn_amount = turn_amount
+
+    def _read_dealt(self, line):
+        """
+        Hero holecards, only looked for on the first line of the hole cards part, as parse_sequence
         """
+        reg_holecard = _RE_DEALT.search(line)
+        if reg_holecard is not None:
+            self.holecards[self.player_inv_dict[reg_holecard.group(1)]] = reg_holecard.group(2).replace(' ', '')
+
+    ######################
+    # Showdown / summary #
+    ######################
+
+    def _read_show_down(self, lines, uncalled):
+        for line in lines:
+            if uncalled and line[0:4] == 'Unca':
+                self._read_uncalled(line)
+            elif ': shows [' in line:
+                reg_show = _RE_SHOWS.search(line)
+                if reg_show is not None:
+                    self.holecards[self.player_inv_dict[reg_show.group(1)]] = reg_show.group(2).replace(' ', '')
+
+    def _read_summary(self, lines, uncalled):
+        for line in lines:
+            if uncalled and line[0:4] == 'Unca':
+                self._read_uncalled(line)
+            elif "Board" in line and line[0:5] == "Board":
+                for i, item in enumerate(_RE_BOARD.search(line).group(1).split(' ')):
+                    if i == 3 or i == 4:  # assuming there is a max of 3 flop
+                        self.boardcards += '/' + item
+                    else:
+                        self.boardcards += item
+            elif "and won" in line or "collected" in line:
+                self.winner = _RE_WINNER.search(line).group(1)
 
-        def shift(list_p, btn_player):
-            """
-            Shift the list of player for starting with the buttun player
-            :param list_p:
-            :param btn_player:
-            :return:
-            """
 
-            rota = deque(list_p)
+# part name: HandHistory method parsing it, the stage the part is timed under. Other parts are parse_sequence
+_PART_STAGES = {None: 'parse_hand', 'SUMMARY': 'parse_summary'}
 
-            for i in range(0,len(list_p)):
-                if rota[0] == btn_player:
-                    return list(rota)
-                rota.rotate(1)
+_HAND_HEADER = 'PokerStars Hand #'
 
-        for sublist in self.pos_name_lst:
-            if len(sublist) == len(self.player_list):
-                player_lst_cy = shift(self.player_list, self.players['BTN'])
-                for player, pos in zip(player_lst_cy, sublist):
 
-                    self.players[pos] = player
+class HandSplitter:
+    """
+    Incremental split of a history text on the "PokerStars Hand #" header: feed() the text as it comes,
+    it returns the hands completed by the header of the next one, flush() returns the last hand.
+    """
+
+    def __init__(self):
+        self._buf = ''
+        self._start = -1  # index of the current hand header in buf
+        self._scan_from = 0  # buf is already known not to contain a header before this index
+
+    def feed(self, text):
+        buf = self._buf + text
+        hands = []
+
+        start = self._start
+        if start == -1:
+            start = buf.find(_HAND_HEADER, self._scan_from)
+            if start == -1:  # keep the end of the buffer, it may be the beginning of a header
+                self._buf = buf[-len(_HAND_HEADER):]
+                self._scan_from = 0
+                return hands
+            self._scan_from = start + 1
+
+        next_start = buf.find(_HAND_HEADER, self._scan_from)
+        while next_start != -1:
+            hands.append(buf[start:next_start].strip())
+            start = next_start
+            next_start = buf.find(_HAND_HEADER, start + 1)
+
+        # drop the hands already returned, the buffer only holds the pending hand
+        self._buf = buf[start:]
+        self._start = 0
+        self._scan_from = max(1, len(self._buf) - len(_HAND_HEADER) + 1)
+        return hands
+
+    def flush(self):
+        hands = [self._buf.strip()] if self._start != -1 else []
+        self.__init__()
+        return hands
+
+
+def iter_hands(path_or_fileobj, chunk_size=1 << 16):
+    """
+    Generator over the hands of a PokerStars history file, one hand text at a time.
+    The file is read by chunks of chunk_size characters, hands are delimited by their "PokerStars Hand #" header
+    (not by blank lines), so memory use only depends on the size of the longest hand.
+    Anything found before the first header is skipped.
+
+    :param path_or_fileobj: path of the history file, or an already opened file object
+    :param chunk_size: number of characters read at once
+    :return: yields the text of each hand, stripped, ready for HandHistory or PS2acpc
+    """
+    if hasattr(path_or_fileobj, 'read'):
+        file_obj = path_or_fileobj
+    else:
+        file_obj = open(path_or_fileobj)
+
+    try:
+        splitter = HandSplitter()
+        while True:
+            chunk = file_obj.read(chunk_size)
+            if not chunk:
+                break
+            for hand in splitter.feed(chunk):
+                yield hand
+        for hand in splitter.flush():
+            yield hand
+    finally:
+        if file_obj is not path_or_fileobj:
+            file_obj.close()
+
+
+# version of the PS2acpc output, to increase whenever the parser output changes (invalidates HH_cache entries)
+PARSER_VERSION = 2  # 2: seat positions of 10-max tables with the button on seat 10
 
-        # Build a reverse dict
-        for tuple_dict in self.players.items():
-            self.player_inv_dict[tuple_dict[1]] = tuple_dict[0]
-        # print(self.players)
-        # print(self.player_inv_dict)
 
 def PS2acpc(ps_text):
-    instance = HandHistory(ps_text)
+    instance = FastHandHistory(ps_text)
     ante = instance.ante
     bblind = instance.bblind
     stacks = instance.stacks
@@ -291,277 +756,312 @@ def PS2acpc(ps_text):
 
 _pos_name_lst = HandHistory.pos_name_lst  # global var for the position list (def in the class)
 
+# one action of a replayed ACPC sequence, chips amounts are in cents
+ReplayedAction = namedtuple('ReplayedAction', ['position', 'action', 'round', 'street_start', 'max_before',
+                                               'investment_before', 'investment', 'allin', 'pot'])
 
-def acpc2PS(stacks, sequence, holecards,  boardcards, winner, players=None, ante=10, bigblind=20, rake=0, uncalled=0):
+
+@_stage('acpc2PS.replay')
+def replay_sequence(stacks, sequence, bb, hand_class=Betting.Hand):
     """
-    Write default args, payers=None
+    Replay the sequence once, recording for each action the acting position, the round,
+    the max investment at the start of the round and before the action, the investments of the player
+    before and after, whether the player is all-in, and the pot after the action.
+
+    :param stacks: dict position: stack, in chips
+    :param sequence: ACPC sequence
+    :param bb: big blind, in chips
+    :param hand_class: betting engine, the pure python firepoker.Betting.Hand or firepoker.Hand.Hand
+    :return: list of ReplayedAction, final pot in cents
+    """
+    stacks_cents = {}
+    for pos in stacks:
+        stacks_cents[pos] = to_cents(stacks[pos])
+    hand = hand_class(1, stacks=stacks_cents, bb=to_cents(bb))
+
+    replayed = []
+    current_round = 0
+    street_start = 0
+    for action_type, cents in parse_sequence(sequence):
+        if action_type == STREET:  # the engine changes round by itself
+            continue
+        acting_pos = hand.get_acting_player()
+        round_ = hand.get_round()
+        max_before = hand.get_investment('max')
+        if round_ != current_round:
+            current_round = round_
+            street_start = max_before
+        investment_before = hand.get_investment(acting_pos)
+
+        action = ACTION_CHARS[action_type]
+        hand.doAction(action + str(cents) if action_type == RAISE else action)
+
+        investment = hand.get_investment(acting_pos)
+        replayed.append(ReplayedAction(acting_pos, action, round_, street_start, max_before, investment_before,
+                                       investment, investment == stacks_cents[acting_pos], hand.get_pot()))
+    return replayed, hand.get_pot()
+
+
+# templates of the acpc2PS lines, shared by all the hands written
+_HEADER_LINE = ("PokerStars Hand #999: Tournament #999, $2.00+$2.00+$0.40 USD Hold'em No "
+                "Limit - Level XVIII ({}/{}) - 2016/07/29 23:25:05 MSK [2016/07/29 16:25:05 ET]\n"
+                "Table '1618015625 40' 3-max Seat #{} is the button").format
+_STACK_LINE = "\nSeat {}: {} ({} in chips)".format
+_BLIND_LINE = "\n{}: posts small blind {}".format
+_DEALT_LINE = "\nDealt to Hero [{}]".format
+_ACTION_LINES = {
+    'folds': "\n{0}: folds".format,
+    'calls': "\n{0}: calls {2}".format,
+    'checks': "\n{0}: checks".format,
+    'bets': "\n{0}: bets {2}".format,
+    'collected': "\n{0}: collected {2} from pot ".format,
+}
+_RAISE_LINE = "\n{}: raises {} to {}".format
+_BOARD_PART = "\n*** {} ***".format
+_BOARD_CARDS = " [{}]".format
+_POT_LINE = "\n*** SUMMARY ***\nTotal pot {} | Rake {}".format
+_BOARD_LINE = "\nBoard [{}]".format
+_SUMMARY_SEAT_LINE = "\nSeat {}: {} {} {}".format
+_SUMMARY_POSITIONS = {'BTN': 'button', 'SB': 'small blind', 'BB': 'big blind'}
+_SUMMARY_FOLDS = ["folded before Flop", "folded on Flop", "folded on the Turn"]  # todo river?
+
+
+def _split_cards(cards):
+    return ' '.join([cards[i:i + 2] for i in range(0, len(cards), 2)])  # split every 2 char, to seperate cards
+
+
+def _player_actions(replayed, players):
+    """
+    From the replayed actions, returns a nested list, for each parts (preflop, flop..)
+    [[["player_name","raises", int_from, int_to, is_allin],["player_name","calls",int_called, is_allin]..],
+    [..]]
+    :param replayed: list of ReplayedAction, from replay_sequence
+    :return:
+    """
+    players_actions = [[], [], [], []]
+    for replayed_action in replayed:
+        acting_player = players.get(replayed_action.position, replayed_action.position)
+        action = replayed_action.action
+        to_call = replayed_action.max_before - replayed_action.investment_before
+
+        if action == 'f':
+            player_action = [acting_player, 'folds']
+        elif action == 'c' and to_call > 0:  # an all-in call may put less than to_call
+            player_action = [acting_player, 'calls',
+                             (replayed_action.investment - replayed_action.investment_before) / 100.0,
+                             replayed_action.allin]
+        elif action == 'c':
+            player_action = [acting_player, 'checks']
+        elif replayed_action.max_before > replayed_action.street_start or replayed_action.round == 0:
+            player_action = [acting_player, 'raises',
+                             (replayed_action.investment - replayed_action.max_before) / 100.0,
+                             (replayed_action.investment - replayed_action.street_start) / 100.0,
+                             replayed_action.allin]
+        else:
+            player_action = [acting_player, 'bets',
+                             (replayed_action.investment - replayed_action.street_start) / 100.0]
+
+        players_actions[replayed_action.round].append(player_action)
+
+    return players_actions
+
+
+def _write_actions(write, actions):
+    """
+    Write the recorded actions of a part from the nested list
+    """
+    for action in actions:
+        if action[1] == 'raises':
+            write(_RAISE_LINE(action[0], action[2], action[3]))
+            if action[4]:
+                write(" and is all-in")
+        else:
+            write(_ACTION_LINES[action[1]](*action))
+            if action[1] == 'calls' and action[3]:
+                write(" and is all-in")
+
+
+def _write_board(write, splitboard, str_part, j):
+    """
+    Write the section name with correspondant boardcards, nothing if the board does not reach the section
+    """
+    if len(splitboard) <= j:
+        return
+    write(_BOARD_PART(str_part))
+    for k in range(0, j + 1):
+        write(_BOARD_CARDS(_split_cards(splitboard[k])))
 
-    Need to:
-    - order players by position, as a list
-    - reverse dict of players
 
+def _action_summary(action_list):
+    """
+    Take the output of _player_actions(), and make a summary of theyre actions, in a dict with play_name as key
+    """
+    summary_dict = {}
+    for street_actions, folded in zip(action_list, _SUMMARY_FOLDS):  # preflop, flop, turn
+        for action in street_actions:
+            if action[1] == 'folds':
+                summary_dict[action[0]] = folded
+            if action[1] == 'collected':
+                summary_dict[action[0]] = " collected ({}) ".format(action[2])
+    return summary_dict
+
+
+@_stage('acpc2PS')
+def write_acpc2PS(write, stacks, sequence, holecards, boardcards, winner, players=None, ante=10, bigblind=20,
+                  rake=0, uncalled=0):
+    """
+    Same as acpc2PS, but the text is passed in pieces to write (eg file.write or list.append) instead of returned
     """
     #####################
     # "Processing" part #
     #####################
 
     n_players = len(stacks)  # gives the number of players
-    sublist_ = _pos_name_lst[n_players-2]  # the list of position correspunding to the number of players (2play: index0)
+    sublist_ = _SEAT_POSITIONS[(n_players, 0)]  # positions of the written seats, the button is the first seat
     # list of players, ordered by their position. If players None, then players name = player position
     players = dict(zip(sublist_, sublist_)) if players is None else players
-    order_players = map(lambda pos: players[pos], sublist_)
+    order_players = [players[pos] for pos in sublist_]
     inv_dict_player = dict(zip(players.values(), players.keys()))  # nice, i thinked the order was not guaranted ;)
 
-    split_sequence = sequence.split("/")
-
-    def sequence_parser(splt_seq):
-        return re.findall("([a-z][0-9-.]*)", splt_seq, re.DOTALL)
-
     split_bordcard = boardcards.split("/")
 
-    def write_board(splitboard, str_part, j):
-        """
-        Craft the different section names with correspondant boardcards
-        """
-        try:
-            board_str = "\n*** {} ***".format(str_part)
-            for k in range(0, j + 1):
-                list_cards = [splitboard[k][i:i + 2] for i in
-                              range(0, len(splitboard[k]), 2)]  # split every 2 char, to seperate cards
-                # return "\n*** {} *** [{}]".format(str_part, ' '.join(list_cards))
-                board_str += " [{}]".format(' '.join(list_cards))
-            return board_str
-        except IndexError:  # if the splitboard index does not exist
-            return ""
-
-    # def default_player():  # remove it, Hero not default
-    #     return "Hero"
-    # game_player = default_player()
-
-    def is_allin(stacks, sequence, position, bb):
-        """
-        Returns bool from the postion name
-        """
-        stacks_computation = {}
-        for pos in stacks:
-            stacks_computation[pos] = int(stacks[pos]*100)
-        hand = Hand.Hand(1, stacks=stacks_computation, bb=int(bb*100))
-        for action in seq_to_actions(sequence):
-            if '/' == action:
-                continue
-            if 'r' in action:
-                action = 'r{}'.format(int(float(action[1:])*100))
-            hand.doAction(action)
-        return stacks_computation[position] == hand.get_investment(position)
-
-    # why? sequence_parser wasnt good?
-    def seq_to_actions(sequence):
-        return sequence.replace('c', ' c').replace('f', ' f').replace('r', ' r').replace('/', ' /').strip().split()
-
-    def pot(stacks, sequence, bb):
-        for pos in stacks:
-            stacks[pos] = int(stacks[pos]*100)
-        hand = Hand.Hand(1, stacks=stacks, bb=int(bb*100))
-        for action in seq_to_actions(sequence):
-            if '/' == action:
-                continue
-            if 'r' in action:
-                action = 'r{}'.format(int(float(action[1:])*100))
-            hand.doAction(action)
-        return (hand.get_pot() / 100.0) -uncalled
-
-    def get_player_actions(stacks, sequence, bb):
-        """
-        With the given informations, maybe more, returns a nested list, for each parts (preflop, flop..)
-        [[["player_name","raises", int_from, int_to],["player_name","bet",int_bet]..],
-        [..]]
-        :param stacks:
-        :param sequence:
-        :param bb:
-        :return: 
-        """
-        stacks_tmp = {}
-        for pos in stacks:
-            stacks_tmp[pos] = int(stacks[pos]*100)
-        hand = Hand.Hand(1, stacks=stacks_tmp, bb=int(bb*100))
-
-        players_actions = [[], [], [], []]
-        last_round_bet = hand.get_investment('max') / 100.0
-        for action in seq_to_actions(sequence.replace('/','')):
-            acting_pos = hand.get_acting_player()
-            acting_player = players.get(acting_pos, acting_pos)
-
-            print hand.get_state_str(), acting_pos
-            if action == 'f':
-                player_action = [acting_player, 'folds']
-            elif action == 'c' and hand.get_investment(acting_pos) < hand.get_investment('max'):
-                amount_to_call = ( hand.get_investment('max') - hand.get_investment(acting_pos)) / 100.0
-                player_action = [acting_player, 'calls', amount_to_call]
-            elif action == 'c':
-                player_action = [acting_player, 'checks']
-            elif action[0] == 'r' and hand.get_round() == 0:  #fixme max_previous defined here, but not always called
-                max_previous_bet = hand.get_investment('max') / 100.0
-                size = float(action[1:])
-                player_action = [acting_player, 'raises', size-max_previous_bet, size]
-            elif action[0] == 'r' and hand.get_num_raises() == 0:
-                size = float(action[1:]) - max_previous_bet
-                player_action = [acting_player, 'bets', size]
-            elif action[0] == 'r':
-                size = float(action[1:]) - max_previous_bet
-            else:
-                print '[{}]'.format(action)
-                raise NotImplementedError
-
-            players_actions[hand.get_round()].append(player_action)
-            if 'r' in action:
-                action = 'r{}'.format(int(float(action[1:])*100))
-            hand.doAction(action)
-
-        return players_actions
+    replayed_actions, final_pot = replay_sequence(stacks, sequence, bigblind)  # pot and all-in flags included
 
-    player_actions = get_player_actions(stacks, sequence, bigblind)
-
-    def write_actions(actions):
-        """
-        Read from recorded actions of a part from the nested list
-        """
-        ret_str = ""
-        for action in actions:
-            if action[1] == 'folds':
-                ret_str += "\n{}: folds".format(action[0])
-            if action[1] == 'calls':
-                ret_str += "\n{}: calls {}".format(action[0], action[2])
-            if action[1] == 'checks':
-                ret_str += "\n{}: checks".format(action[0])
-            if action[1] == 'raises':
-                ret_str += "\n{}: raises {} to {}".format(action[0], action[2], action[3])  # check is allin
-                ret_str += " and is all-in" if is_allin(stacks, sequence, inv_dict_player[action[0]], bigblind) else ""
-            if action[1] == 'bet':
-                ret_str += "\n{}: bet {} ".format(action[0], action[2])
-            if action[1] == 'collected':
-                ret_str += "\n{}: collected {} from pot ".format(action[0], action[2])
-        return ret_str
-
-    def write_action_summary(action_list):
-        """
-        Take the output of player_actions(), and make a summary of theyre actions, in a dict with play_name as key
-        """
-        summary_dict = {}
-        #preflop
-        for action in action_list[0]:
-            if action[1] == 'folds':
-                summary_dict[action[0]] = "folded before Flop"
-            if action[1] == 'collected':
-                summary_dict[action[0]] = " collected ({}) ".format(action[2])
-
-        #flop
-        for action in action_list[1]:
-            if action[1] == 'folds':
-                summary_dict[action[0]] = "folded on Flop"
-            if action[1] == 'collected':
-                summary_dict[action[0]] = " collected ({}) ".format(action[2])
-
-
-        #turn
-        for action in action_list[2]:
-            if action[1] == 'folds':
-                summary_dict[action[0]] = "folded on the Turn"
-            if action[1] == 'collected':
-                summary_dict[action[0]] = " collected ({}) ".format(action[2])
-        # todo river?
-        return summary_dict
+    profiler = _profiler
+    if profiler is not None:
+        start = _timer()
+    player_actions = _player_actions(replayed_actions, players)
+    if profiler is not None:
+        profiler.record('acpc2PS.actions', _timer() - start)
 
     ###################
     # "Writting" part #
     ###################
 
-    ret_string = ""
-    play_stack_str = ""
-    btn_num = 0
+    if profiler is not None:
+        start = _timer()
 
-    # build header
-    header = "PokerStars Hand #999: Tournament #999, $2.00+$2.00+$0.40 USD Hold'em No " \
-             "Limit - Level XVIII ({}/{}) - 2016/07/29 23:25:05 MSK [2016/07/29 16:25:05 ET]\n" \
-             "Table '1618015625 40' 3-max Seat #{} is the button".format(bigblind/2.0, bigblind, btn_num+1)  # 0:.2f for floats?
+    # header, the button is always seat 1
+    write(_HEADER_LINE(bigblind/2.0, bigblind, 1))  # 0:.2f for floats?
 
-    #build player_stack_str
+    # player stacks
     for i, player in enumerate(order_players):
-        # ret_string += "Seat "+i+" "+str(players[player_pos] if players[player_pos] is not None else "Player"+i)
-        play_stack_str += "\nSeat {}: {} ({} in chips)".format(i+1, player, stacks[sublist_[i]])
-        if player == players['BTN']:
-            btn_num = i
+        write(_STACK_LINE(i+1, player, stacks[sublist_[i]]))
 
     # TODO ants..
     # small/big lbind posts
-    try:
-        blind_str = "\n{}: posts small blind {}".format(players['SB'], bigblind/2.0)
-    except KeyError:  # if sb doest not exist
-        blind_str = "\n{}: posts small blind {}".format(players['BTN'], bigblind/2.0)  # when 2 players, BTN is also SB
-    blind_str += "\n{}: posts small blind {}".format(players['BB'], bigblind)
+    write(_BLIND_LINE(players['SB'] if 'SB' in players else players['BTN'], bigblind/2.0))  # 2 players, BTN is SB
+    write(_BLIND_LINE(players['BB'], bigblind))
 
     #####################
     # Holecard and part #
     #####################
-    # holecards str
-    holecards_str = "\n*** HOLE CARDS ***"
-
+    write("\n*** HOLE CARDS ***")
 
     # the "dealt" part
     if 'Hero' in players.values():
-        # holecards_str += "\nDealt to {} [{}]".format(game_player, holecards[inv_dict_player[game_player]])
-        holecards_str += "\nDealt to Hero [{}]".format(holecards[inv_dict_player['Hero']])
-
-    # actions for holecards [0]
-    holecards_str += write_actions(player_actions[0])
+        write(_DEALT_LINE(holecards[inv_dict_player['Hero']]))
 
-    # write the pending boardcards, and player actions in between
-    flop_str = write_board(split_bordcard, "FLOP", 0) if split_bordcard[0] != "" else ""
-    holecards_str += write_actions(player_actions[1])
+    # actions of all the parts, the boards are written after them
+    for street_actions in player_actions:
+        _write_actions(write, street_actions)
 
-    turn_str = write_board(split_bordcard, "TURN", 1)
-    holecards_str += write_actions(player_actions[2])
-
-    river_str = write_board(split_bordcard, "RIVER", 2)
-    holecards_str += write_actions(player_actions[3])
-    #############
-    # Show down #
-    #############
+    if split_bordcard[0] != "":
+        _write_board(write, split_bordcard, "FLOP", 0)
+    _write_board(write, split_bordcard, "TURN", 1)
+    _write_board(write, split_bordcard, "RIVER", 2)
 
     ###########
     # SUMMARY #
     ###########
 
-    summary_str = "\n*** SUMMARY ***" \
-                  "\nTotal pot {} | Rake {}".format(pot(stacks, sequence, bigblind), rake)
+    write(_POT_LINE(final_pot / 100.0 - uncalled, rake))
 
     # make the boardcard summary, if not empty
-    action_summary = write_action_summary(player_actions)  # type: dict ,to write "folded before flop" etc..
+    action_summary = _action_summary(player_actions)  # type: dict ,to write "folded before flop" etc..
     final_board = boardcards.replace("/", "")
-    list_board = [final_board[i:i + 2] for i in range(0, len(final_board), 2)]
-    summary_str += "\nBoard [{}]".format(' '.join(list_board)) if len(list_board) > 0 else ""
+    if final_board:
+        write(_BOARD_LINE(_split_cards(final_board)))
 
-    string_pos_dict = {'BTN': 'button', 'SB': 'small blind', 'BB': 'big blind'}
     for i, player in enumerate(order_players):
-        summary_str += "\nSeat {}: {} {} {}".format(i+1, player,  '('+string_pos_dict[sublist_[i]]+')'
-        if sublist_[i] in ['BTN', 'SB', 'BB'] else "", action_summary.get(player, ""))
+        write(_SUMMARY_SEAT_LINE(i+1, player, '('+_SUMMARY_POSITIONS[sublist_[i]]+')'
+                                 if sublist_[i] in _SUMMARY_POSITIONS else "", action_summary.get(player, "")))
         if player == winner:
-            summary_str += " won"
+            write(" won")
+
+    if profiler is not None:
+        profiler.record('acpc2PS.write', _timer() - start)
 
-    # craft return string
-    ret_string += header
-    ret_string += play_stack_str
-    ret_string += blind_str
-    ret_string += holecards_str
-    ret_string += flop_str
-    ret_string += turn_str
-    ret_string += river_str
-    ret_string += summary_str
 
-    return ret_string
+def acpc2PS(stacks, sequence, holecards,  boardcards, winner, players=None, ante=10, bigblind=20, rake=0, uncalled=0):
+    """
+    Write default args, payers=None
+
+    Need to:
+    - order players by position, as a list
+    - reverse dict of players
+
+    """
+    parts = []
+    write_acpc2PS(parts.append, stacks, sequence, holecards, boardcards, winner, players, ante, bigblind, rake,
+                  uncalled)
+    return ''.join(parts)
+
+
+def write_hands(records, sink, separator='\n\n\n', encoding='utf-8', buffer_size=1 << 16, on_error=None):
+    """
+    Write many hands with acpc2PS into a file object, through a buffer of about buffer_size characters,
+    so the memory used does not depend on the number of hands.
+
+    with open('export.txt', 'w') as fh:
+        write_hands(PS2acpc(hand) for hand in iter_hands('archive.txt'), fh)
+
+    :param records: iterable of PS2acpc tuples (ante, bblind, stacks, sequence, holecards, boardcards, winner, players,
+    uncalled)
+    :param sink: text or binary file object, the text is encoded with encoding for binary ones
+    :param separator: written after each hand
+    :param on_error: called with (index, record, exception) when a hand can not be written, the hand is then skipped.
+    The exception is raised when None
+    :return: number of hands written
+    """
+    mode = getattr(sink, 'mode', None)  # an int for gzip files, which are BufferedIOBase
+    binary = isinstance(sink, (io.RawIOBase, io.BufferedIOBase)) or (isinstance(mode, str) and 'b' in mode)
+    encode = binary and not isinstance(separator, bytes)  # python 2 writes str to binary files
+
+    parts = []
+    write = parts.append
+    buffered = 0
+    n_written = 0
+    for index, record in enumerate(records):
+        ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = record
+        n_parts = len(parts)
+        try:
+            write_acpc2PS(write, stacks, sequence, holecards, boardcards, winner, players, ante, bblind,
+                          uncalled=uncalled)
+        except Exception as e:
+            if on_error is None:
+                raise
+            del parts[n_parts:]  # drop what was written of the hand
+            on_error(index, record, e)
+            continue
+        write(separator)
+        n_written += 1
+
+        buffered += sum(len(part) for part in parts[n_parts:])
+        if buffered >= buffer_size:
+            data = ''.join(parts)
+            sink.write(data.encode(encoding) if encode else data)
+            del parts[:]
+            buffered = 0
+
+    if parts:
+        data = ''.join(parts)
+        sink.write(data.encode(encoding) if encode else data)
+    return n_written
 
 
 if __name__ == '__main__':
-    hands = open('hands_example.txt').read().split('\n\n')  # not always
+    hands = iter_hands('hands_example.txt')
 
     # help(firepoker)
 
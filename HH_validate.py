@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Round trip validation of whole archives: each hand is converted with PS2acpc, written back with acpc2PS and parsed
+again, the second parse is compared with the first one.
+
+python HH_validate.py histories/ -w 8 --samples 5 -o validation.json
+
+report = validate_files(['histories/'], workers=8)
+print(report.summary())  # {'hands': .., 'ok': .., 'classes': {'sequence': {'count': .., 'samples': [..]}, ..}}
+
+A hand falls in one or more mismatch classes: parse_error, write_error or reparse_error (followed by the exception
+name) when a step raises, stacks, sequence, boardcards, winner or pot when the field differs. The pot is the
+"Total pot" of the summaries. Counts are exact, only the first sample_limit hands of each class are kept as samples.
+"""
+
+from __future__ import print_function
+
+import re
+import sys
+import json
+import argparse
+import multiprocessing
+from collections import namedtuple
+
+from HH_tools import PS2acpc, acpc2PS
+from HH_codec import to_cents, parse_sequence
+from HH_batch import list_files, iter_jobs, imap_bounded
+
+_RE_HAND_ID = re.compile(r'PokerStars Hand #(\d+)')
+_RE_TOTAL_POT = re.compile(r'Total pot \$?([0-9.]+)')
+_DETAIL_LENGTH = 200
+
+# mismatches: tuple of (class, detail), empty when the round trip gives the same hand
+ValidatedHand = namedtuple('ValidatedHand', ['path', 'index', 'hand_id', 'mismatches'])
+
+
+def _total_pot(ps_text):
+    reg_pot = _RE_TOTAL_POT.search(ps_text)
+    return to_cents(reg_pot.group(1)) if reg_pot is not None else None
+
+
+def _detail(original, round_trip):
+    return '{!r} != {!r}'.format(original, round_trip)[:_DETAIL_LENGTH]
+
+
+def compare_hands(acpc, ps_text, acpc_round_trip, ps_text_round_trip):
+    """
+    Structural diff of a hand and its round trip
+    :return: list of (class, detail)
+    """
+    stacks = dict((pos, to_cents(stack)) for pos, stack in acpc[2].items())
+    stacks_round_trip = dict((pos, to_cents(stack)) for pos, stack in acpc_round_trip[2].items())
+    fields = [
+        ('stacks', stacks, stacks_round_trip),
+        ('sequence', parse_sequence(acpc[3]), parse_sequence(acpc_round_trip[3])),
+        ('boardcards', acpc[5], acpc_round_trip[5]),
+        ('winner', acpc[6], acpc_round_trip[6]),
+        ('pot', _total_pot(ps_text), _total_pot(ps_text_round_trip)),
+    ]
+    mismatches = []
+    for name, original, round_trip in fields:
+        if original != round_trip:
+            detail = _detail(acpc[3], acpc_round_trip[3]) if name == 'sequence' else _detail(original, round_trip)
+            mismatches.append((name, detail))
+    return mismatches
+
+
+def validate_hand(ps_text):
+    """
+    Round trip one hand
+    :return: tuple of (class, detail), empty when the hand is the same after the round trip
+    """
+    step = 'parse_error'
+    try:
+        acpc = PS2acpc(ps_text)
+        step = 'write_error'
+        ante, bblind, stacks, sequence, holecards, boardcards, winner, players, uncalled = acpc
+        ps_text_round_trip = acpc2PS(stacks, sequence, holecards, boardcards, winner, players, ante, bblind,
+                                     uncalled=uncalled)
+        step = 'reparse_error'
+        acpc_round_trip = PS2acpc(ps_text_round_trip)
+    except Exception as e:
+        return ((step + ':' + type(e).__name__, str(e)[:_DETAIL_LENGTH]),)
+    return tuple(compare_hands(acpc, ps_text, acpc_round_trip, ps_text_round_trip))
+
+
+def _validate_job(job):
+    """
+    Worker function, validate_hand does not raise
+    :return: ValidatedHand, None when the hand has no mismatch (nothing more to send back)
+    """
+    path, index, hand = job
+    mismatches = validate_hand(hand)
+    if not mismatches:
+        return None
+    reg_hand = _RE_HAND_ID.search(hand)
+    return ValidatedHand(path, index, int(reg_hand.group(1)) if reg_hand is not None else None, mismatches)
+
+
+class ValidationReport:
+    """
+    Counts of the mismatch classes, and the first sample_limit hands of each class
+    """
+
+    def __init__(self, sample_limit=10):
+        self.sample_limit = sample_limit
+        self.hands = 0
+        self.ok = 0
+        self.counts = {}  # class: number of hands
+        self.samples = {}  # class: list of dicts path, index, hand_id, detail
+
+    def add(self, result):
+        """
+        :param result: ValidatedHand, or None for a hand without mismatch
+        """
+        self.hands += 1
+        if result is None or not result.mismatches:
+            self.ok += 1
+            return
+        for name, detail in result.mismatches:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            samples = self.samples.setdefault(name, [])
+            if len(samples) < self.sample_limit:
+                samples.append({'path': result.path, 'index': result.index, 'hand_id': result.hand_id,
+                                'detail': detail})
+
+    def summary(self):
+        return {
+            'hands': self.hands,
+            'ok': self.ok,
+            'mismatched': self.hands - self.ok,
+            'classes': dict((name, {'count': count, 'samples': self.samples[name]})
+                            for name, count in self.counts.items()),
+        }
+
+
+def validate_files(paths, workers=None, chunksize=256, sample_limit=10, pattern='*.txt'):
+    """
+    Round trip every hand of the given files and directories, over a process pool.
+    Hands are read ahead a few chunks per worker as in HH_batch.convert_files, the workers only send back the mismatches.
+
+    :param workers: number of processes, None for the number of cpus. 1 validates in the current process
+    :param chunksize: number of hands sent to a worker at once
+    :param sample_limit: samples kept by mismatch class
+    :return: ValidationReport
+    """
+    report = ValidationReport(sample_limit)
+    jobs = iter_jobs(list_files(paths, pattern))
+    if workers == 1:
+        for job in jobs:
+            report.add(_validate_job(job))
+        return report
+
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers)
+    try:
+        # in order, same samples as workers=1
+        for result in imap_bounded(pool, _validate_job, jobs, chunksize, workers * chunksize * 4):
+            report.add(result)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('paths', nargs='+', help="history files or directories")
+    parser.add_argument('-w', '--workers', type=int, help="number of processes, the number of cpus by default")
+    parser.add_argument('--samples', type=int, default=10, help="samples kept by mismatch class")
+    parser.add_argument('--pattern', default='*.txt', help="file name pattern used in directories")
+    parser.add_argument('-o', '--output', help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = validate_files(args.paths, workers=args.workers, sample_limit=args.samples, pattern=args.pattern)
+    report_json = json.dumps(report.summary(), indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(report_json)
+    else:
+        print(report_json)
+    print('{} hands, {} ok'.format(report.hands, report.ok), file=sys.stderr)
+    return 0 if report.ok == report.hands else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Pure python no-limit betting state machine, following the ACPC game rules used by the firepoker extension
+(initState, currentPlayer, doAction, raiseIsValid, isValidAction), without the GAMEDEF, the rng and the dealing.
+Same methods as firepoker.Hand.Hand for the betting part, so it can replace it when only the actions are replayed.
+"""
+
+_BB = 120
+
+_NUM_ROUNDS = 4
+
+# seat order of the game: blinds first and button last, same as firepoker.Hand._pos_name_lst for 2 and 3 players
+_pos_name_lst = [
+        ["BB", "BTN"],
+        ["SB", "BB", "BTN"],
+        ["SB", "BB", "CO", "BTN"],
+        ["SB", "BB", "UTG", "CO", "BTN"],
+        ["SB", "BB", "UTG", "MP1", "CO", "BTN"],
+        ["SB", "BB", "UTG", "MP1", "MP2", "CO", "BTN"],
+        ["SB", "BB", "UTG", "MP1", "MP2", "MP3", "CO", "BTN"],
+        ["SB", "BB", "UTG", "UTG+1", "MP1", "MP2", "MP3", "CO", "BTN"],
+        ["SB", "BB", "UTG", "UTG+1", "UTG+2", "MP1", "MP2", "MP3", "CO", "BTN"],
+    ]
+
+
+class Hand(object):
+    """
+    Betting state of one hand. rng_seed and hand_id are accepted for compatibility with firepoker.Hand.Hand,
+    but nothing is dealt. The ante is counted in the pot only, as dead money.
+    """
+
+    def __init__(self, rng_seed=None, stacks=None, hand_id=0, bb=_BB, ante=0):
+        assert stacks is not None
+        self._positions = _pos_name_lst[len(stacks) - 2]
+        n_players = len(self._positions)
+        self._num_players = n_players
+        self._stacks = [int(stacks[pos]) for pos in self._positions]
+
+        if n_players == 2:
+            self._blinds = [bb, bb // 2]
+        else:
+            self._blinds = [bb // 2, bb] + [0] * (n_players - 2)
+        # seat acting first on each round: after the big blind preflop, first seat after
+        self._first_player = [1 if n_players == 2 else 2, 0, 0, 0]
+        self._min_raise_by = max(self._blinds + [1])  # raise-by after the first round
+        self._ante_total = ante * n_players
+
+        # initState
+        self._spent = list(self._blinds)
+        self._max_spent = max(self._spent)
+        self._min_raise_to = self._max_spent * 2 if self._max_spent else 1
+        self._folded = [False] * n_players
+        self._actions = [[] for _ in range(_NUM_ROUNDS)]  # (type, size) by round
+        self._acting = [[] for _ in range(_NUM_ROUNDS)]  # acting seat of each action
+        self._round = 0
+        self._finished = False
+
+    ################
+    # ACPC helpers #
+    ################
+
+    def _next_player(self, seat):
+        spent = self._spent
+        stacks = self._stacks
+        folded = self._folded
+        for _ in range(self._num_players):  # bounded, when nobody can act the last seat tried is returned
+            seat = (seat + 1) % self._num_players
+            if not folded[seat] and spent[seat] < stacks[seat]:
+                break
+        return seat
+
+    def _current_player(self):
+        acting = self._acting[self._round]
+        if acting:
+            return self._next_player(acting[-1])
+        return self._next_player(self._first_player[self._round] + self._num_players - 1)
+
+    def _num_called(self):
+        """
+        Number of acting players who have called the current bet (the raiser included)
+        """
+        called = 0
+        actions = self._actions[self._round]
+        acting = self._acting[self._round]
+        for i in range(len(actions) - 1, -1, -1):
+            action_type = actions[i][0]
+            seat = acting[i]
+            if action_type == 'r':
+                if self._spent[seat] < self._stacks[seat]:
+                    called += 1
+                return called
+            elif action_type == 'c':
+                if self._spent[seat] < self._stacks[seat]:
+                    called += 1
+        return called
+
+    def _num_acting_players(self):
+        return sum(1 for seat in range(self._num_players)
+                   if not self._folded[seat] and self._spent[seat] < self._stacks[seat])
+
+    def _raise_range(self):
+        """
+        Return (min, max) raise-to for the current player, None if raising is not allowed
+        """
+        if self._num_acting_players() <= 1:
+            return None
+        seat = self._current_player()
+        max_size = self._stacks[seat]
+        min_size = min(self._min_raise_to, max_size)
+        if max_size <= self._max_spent:
+            return None
+        return min_size, max_size
+
+    def _is_valid(self, action_type, size):
+        if self._finished:
+            return False
+        if action_type == 'r':
+            raise_range = self._raise_range()
+            return raise_range is not None and raise_range[0] <= size <= raise_range[1]
+        if action_type == 'f':
+            seat = self._current_player()
+            return self._spent[seat] != self._max_spent and self._spent[seat] != self._stacks[seat]
+        return action_type == 'c'
+
+    ##################
+    # Hand interface #
+    ##################
+
+    def finished(self):
+        return self._finished
+
+    def doAction(self, action):
+        action_type = action[0]
+        size = int(action[1:]) if action_type == 'r' else 0
+        assert self._is_valid(action_type, size)
+
+        seat = self._current_player()
+        self._actions[self._round].append((action_type, size))
+        self._acting[self._round].append(seat)
+
+        if action_type == 'f':
+            self._folded[seat] = True
+        elif action_type == 'c':
+            self._spent[seat] = min(self._max_spent, self._stacks[seat])
+        else:
+            if size * 2 - self._max_spent > self._min_raise_to:
+                self._min_raise_to = size * 2 - self._max_spent
+            self._max_spent = size
+            self._spent[seat] = size
+
+        # see if the round or the hand has ended
+        if sum(self._folded) + 1 >= self._num_players:
+            self._finished = True
+        elif self._num_called() >= self._num_acting_players():
+            if self._num_acting_players() > 1:
+                if self._round + 1 < _NUM_ROUNDS:
+                    self._round += 1
+                    self._min_raise_to = self._min_raise_by + self._max_spent
+                else:
+                    self._finished = True
+            else:  # nobody left to bet, straight to showdown
+                self._finished = True
+                self._round = _NUM_ROUNDS - 1
+
+    def get_acting_player(self):
+        return self._positions[self._current_player()]
+
+    def get_num_players(self):
+        return self._num_players
+
+    def get_state_str(self):
+        state = ''
+        for r in range(self._round + 1):
+            for action_type, size in self._actions[r]:
+                state += action_type + (str(size) if action_type == 'r' else '')
+            if r != self._round:
+                state += '/'
+        return state
+
+    def get_minraise(self):
+        raise_range = self._raise_range()
+        return raise_range[0] if raise_range is not None else None
+
+    def get_pot(self):
+        return sum(self._spent) + self._ante_total
+
+    def get_num_raises(self):
+        return sum(1 for action_type, size in self._actions[self._round] if action_type == 'r')
+
+    def get_round(self):
+        return self._round
+
+    def get_investment(self, pos):
+        if pos.lower() == 'max':
+            return self._max_spent
+        else:
+            return self._spent[self._positions.index(pos)]
@@ -0,0 +1,158 @@
+"""
+Batch hand evaluator with NumPy, for many showdowns at once.
+
+Cards are ints from 0 to 51, the same as firepoker.Hand.Card2Str (rank * 4 + suit), the cards of a hand must be
+distinct.
+
+ranks = evaluate(holecards, boardcards)  # (n, 2) and (n, 5) int arrays -> (n,) int32
+ranks[0] > ranks[1]  # the first hand wins
+
+A rank is category << 20 | tie breaker, higher is better and equal ranks split the pot.
+The tie breaker is made of the ranks of the cards that matter, 4 bits each, from lookup tables
+over the 8192 sets of card ranks (best straight, top 5 ranks). Each hand is a 52 bits mask of its cards,
+the pairs, trips and flushes are found with bit operations on the masks of the whole batch.
+"""
+
+import numpy as np
+
+HIGH_CARD = 0
+PAIR = 1
+TWO_PAIR = 2
+TRIPS = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+QUADS = 7
+STRAIGHT_FLUSH = 8
+CATEGORY_NAMES = ['high card', 'pair', 'two pair', 'three of a kind', 'straight', 'flush', 'full house',
+                  'four of a kind', 'straight flush']
+
+_NUM_RANKS = 13
+_NUM_SUITS = 4
+_CHUNK_SIZE = 1 << 16  # hands evaluated at once, bounds the temporary arrays
+
+
+def _make_tables():
+    """
+    Tables indexed by a 13 bits set of card ranks:
+    top5: the 5 highest ranks, 4 bits each, highest first. top5 >> 16 is the highest rank, top5 >> 12 the 2 highest..
+    straight: highest rank of the best straight + 1, 0 without straight (3 + 1 for the wheel, A2345)
+    """
+    masks = np.arange(1 << _NUM_RANKS)
+    top5 = np.zeros(1 << _NUM_RANKS, np.int32)
+    found = np.zeros(1 << _NUM_RANKS, np.int32)  # number of ranks already in top5
+    for rank in range(_NUM_RANKS - 1, -1, -1):
+        has_rank = ((masks >> rank) & 1).astype(bool) & (found < 5)
+        top5[has_rank] |= rank << (4 * (4 - found[has_rank]))
+        found += has_rank
+
+    straight = np.zeros(1 << _NUM_RANKS, np.int32)
+    for high in range(3, _NUM_RANKS):  # lowest first, higher straights overwrite
+        if high == 3:  # the wheel, the ace plays low
+            needed = (1 << 12) | 0b1111
+        else:
+            needed = 0b11111 << (high - 4)
+        straight[(masks & needed) == needed] = high + 1
+    return top5, straight
+
+
+_TOP5, _STRAIGHT = _make_tables()
+_POPCOUNT = np.array([bin(mask).count('1') for mask in range(1 << _NUM_RANKS)], np.int32)
+_NIBBLE_LOW_BITS = int('1' * _NUM_RANKS, 16)  # lowest bit of each of the 13 rank nibbles
+
+
+def _top(mask, n):
+    """
+    The n highest ranks of the rank sets, 4 bits each
+    """
+    return _TOP5[mask] >> (4 * (5 - n))
+
+
+def _compress(flags):
+    """
+    Gather the bits 0, 4, 8.. 48 of flags (one per rank nibble) into a 13 bits set of ranks
+    """
+    flags = (flags | (flags >> 3)) & 0x0303030303030303
+    flags = (flags | (flags >> 6)) & 0x000F000F000F000F
+    flags = (flags | (flags >> 12)) & 0x000000FF000000FF
+    return ((flags | (flags >> 24)) & 0xFFFF).astype(np.int32)
+
+
+def _evaluate_chunk(cards):
+    # one bit per card, card = rank * 4 + suit so each rank is a nibble of the mask
+    mask = (np.int64(1) << cards.astype(np.int64)).sum(axis=1)
+    counts = mask & _NIBBLE_LOW_BITS
+    for suit in range(1, _NUM_SUITS):
+        counts += (mask >> suit) & _NIBBLE_LOW_BITS  # each nibble holds the count of its rank, 0 to 4
+
+    m1 = _compress((counts | (counts >> 1) | (counts >> 2)) & _NIBBLE_LOW_BITS)  # ranks present
+    m2 = _compress(((counts >> 1) | (counts >> 2)) & _NIBBLE_LOW_BITS)  # ranks paired (or more)
+    m3 = _compress(((counts >> 2) | ((counts >> 1) & counts)) & _NIBBLE_LOW_BITS)
+    m4 = _compress((counts >> 2) & _NIBBLE_LOW_BITS)
+
+    has_flush = np.zeros(len(cards), bool)
+    flush_mask = np.zeros(len(cards), np.int32)
+    for suit in range(_NUM_SUITS):
+        suit_mask = _compress((mask >> suit) & _NIBBLE_LOW_BITS)
+        is_flush = _POPCOUNT[suit_mask] >= 5  # 7 cards at most, only one suit can have 5
+        has_flush |= is_flush
+        flush_mask[is_flush] = suit_mask[is_flush]
+
+    # ranks of the best quads, trips and pairs, and the sets without them for the kickers
+    quads = _top(m4, 1)
+    trips = _top(m3, 1)
+    fh_pair = _top(m2 & ~(1 << trips), 1)  # a second trips counts as the pair
+    pair1 = _top(m2, 1)
+    pair2 = _top(m2 & ~(1 << pair1), 1)
+    straight_flush = _STRAIGHT[flush_mask]
+    straight = _STRAIGHT[m1]
+
+    conditions = [
+        straight_flush > 0,
+        m4 != 0,
+        (m3 != 0) & ((m2 & ~(1 << trips)) != 0),
+        has_flush,
+        straight > 0,
+        m3 != 0,
+        (m2 & (m2 - 1)) != 0,  # at least 2 pairs
+        m2 != 0,
+    ]
+    choices = [
+        (STRAIGHT_FLUSH << 20) | straight_flush,
+        (QUADS << 20) | (quads << 4) | _top(m1 & ~(1 << quads), 1),
+        (FULL_HOUSE << 20) | (trips << 4) | fh_pair,
+        (FLUSH << 20) | _TOP5[flush_mask],
+        (STRAIGHT << 20) | straight,
+        (TRIPS << 20) | (trips << 8) | _top(m1 & ~(1 << trips), 2),
+        (TWO_PAIR << 20) | (pair1 << 8) | (pair2 << 4) | _top(m1 & ~((1 << pair1) | (1 << pair2)), 1),
+        (PAIR << 20) | (pair1 << 12) | _top(m1 & ~(1 << pair1), 3),
+    ]
+    return np.select(conditions, choices, default=(HIGH_CARD << 20) | _TOP5[m1]).astype(np.int32)
+
+
+def evaluate(holecards, boardcards=None):
+    """
+    Rank of the best 5 cards hand of each row
+    :param holecards: (n, 2) int array, or (n, k) with all the cards of the hand when boardcards is None
+    :param boardcards: (n, 5) int array, or (5,) for the same board on all the rows
+    :return: (n,) int32 array of ranks
+    """
+    cards = np.asarray(holecards, dtype=np.int32)
+    if boardcards is not None:
+        board = np.asarray(boardcards, dtype=np.int32)
+        if board.ndim == 1:
+            board = np.broadcast_to(board, (len(cards), len(board)))
+        cards = np.concatenate([cards, board], axis=1)
+    assert cards.ndim == 2 and 5 <= cards.shape[1] <= 7
+
+    result = np.empty(len(cards), np.int32)
+    for start in range(0, len(cards), _CHUNK_SIZE):
+        result[start:start + _CHUNK_SIZE] = _evaluate_chunk(cards[start:start + _CHUNK_SIZE])
+    return result
+
+
+def category(ranks):
+    """
+    Category of the ranks (HIGH_CARD .. STRAIGHT_FLUSH), CATEGORY_NAMES[category] gives the name
+    """
+    return np.asarray(ranks) >> 20
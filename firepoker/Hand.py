@@ -1,4 +1,7 @@
+import os
 import random
+import tempfile
+from collections import OrderedDict
 import firepoker
 
 _BB = 120
@@ -19,23 +22,7 @@ _pos_name_lst = [
         # ["UTG", "UTG+1", "UTG+2", "MP1", "MP2", "MP3", "CO", "BTN", "SB", "BB"],
     ]
 
-def MakeTempGamefile(stacks, ante=0, bb=_BB):
-    temp_filename = 'temp.game'
-    n_players = len(stacks)
-
-    print(n_players)
-    stacks_str = ' '
-    for pos in _pos_name_lst[n_players-2]:
-        stacks_str += '{} '.format(int(stacks[pos]))
-
-    if n_players == 2:
-        blinds = [bb, bb/2]
-    else:
-        blinds = [bb / 2, bb] + [0] * (n_players-2)
-    blinds = ' '.join( map(str, blinds))
-
-    fh = open(temp_filename, 'w')
-    fh.write('''GAMEDEF
+_GAMEDEF = '''GAMEDEF
 nolimit
 numPlayers = {}
 numRounds = 4
@@ -48,11 +35,73 @@ numSuits = 4
 numRanks = 13
 numHoleCards = 2
 numBoardCards = 0 3 1 1
-END GAMEDEF'''.format( n_players, stacks_str, ante, blinds, n_players )
-    )
-    fh.close()   
+END GAMEDEF'''
+
+_GAME_CACHE_SIZE = 1024
+_game_cache = OrderedDict()  # (numPlayers, stacks, blinds, ante) -> firepoker game, least recently used first
+
+
+def _game_params(stacks, ante=0, bb=_BB):
+    """
+    Return the game parameters from the stacks dict, as a hashable tuple (numPlayers, stacks, blinds, ante)
+    """
+    n_players = len(stacks)
+    stacks_tuple = tuple(int(stacks[pos]) for pos in _pos_name_lst[n_players-2])
+
+    if n_players == 2:
+        blinds = [bb, bb/2]
+    else:
+        blinds = [bb / 2, bb] + [0] * (n_players-2)
+    return n_players, stacks_tuple, tuple(blinds), ante
+
+
+def MakeGameDef(stacks, ante=0, bb=_BB):
+    """
+    Return the GAMEDEF text for the given stacks, blinds and ante
+    """
+    n_players, stacks_tuple, blinds, ante = _game_params(stacks, ante, bb)
+    stacks_str = ' ' + ''.join('{} '.format(stack) for stack in stacks_tuple)
+    return _GAMEDEF.format(n_players, stacks_str, ante, ' '.join(map(str, blinds)), n_players)
+
+
+def MakeTempGamefile(stacks, ante=0, bb=_BB):
+    temp_filename = 'temp.game'
+    fh = open(temp_filename, 'w')
+    fh.write(MakeGameDef(stacks, ante, bb))
+    fh.close()
     return temp_filename
 
+
+def readGameDef(gamedef):
+    """
+    Build a firepoker game from a GAMEDEF string.
+    The extension only reads games from a file, so it goes through a private temporary file
+    (unique name, removed right after) instead of the shared temp.game.
+    """
+    fd, filename = tempfile.mkstemp(suffix='.game')
+    try:
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(gamedef)
+        return firepoker.readGame(filename)
+    finally:
+        os.remove(filename)
+
+
+def get_game(stacks, ante=0, bb=_BB):
+    """
+    Return the firepoker game for these stacks, blinds and ante.
+    Games are cached, identical table configurations share the same game object.
+    """
+    key = _game_params(stacks, ante, bb)
+    game = _game_cache.pop(key, None)
+    if game is None:
+        game = readGameDef(MakeGameDef(stacks, ante, bb))
+        if len(_game_cache) >= _GAME_CACHE_SIZE:
+            _game_cache.popitem(last=False)
+    _game_cache[key] = game
+    return game
+
+
 def Card2Str(card):
     return values[int(card) // len(suits)] + suits[card % len(suits)]
 
@@ -63,8 +112,7 @@ class Hand:
             self._game = firepoker.readGame(gamefilename)        
         else:
             assert stacks is not None
-            tempgamefile = MakeTempGamefile(stacks=stacks, ante=ante, bb=bb)            
-            self._game = firepoker.readGame(tempgamefile) 
+            self._game = get_game(stacks=stacks, ante=ante, bb=bb)
             
         self._state = firepoker.initState(self._game, hand_id)
         firepoker.dealCards(self._game, self._rng, self._state)